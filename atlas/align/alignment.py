@@ -1,7 +1,9 @@
 
 import numpy as np
-from typing import Dict, Any, Tuple
-from ..utils.utils import orthogonal_procrustes, whiten
+from typing import Dict, Any, Iterable, Tuple
+from ..utils.utils import QuantileSketch, RunningCovariance, orthogonal_procrustes, randomized_svd, whiten, whitening_matrix
+
+SAT_PERCENTILES = [5,25,50,75,95]
 
 def procrustes_align(A: np.ndarray, B: np.ndarray) -> np.ndarray:
     # A and B: k x d bases (rows are basis vectors). Return rotation R such that R@A ≈ B.
@@ -13,17 +15,107 @@ def dynamics_fingerprint(acts: np.ndarray) -> Dict[str, Any]:
     C = (acts.T @ acts) / max(1, acts.shape[0]-1)
     svals = np.linalg.svd(C, compute_uv=False)[:16]
     # Saturation proxy: percentiles
-    pct = np.percentile(acts, [5,25,50,75,95], axis=0).mean(axis=-1)
+    pct = np.percentile(acts, SAT_PERCENTILES, axis=0).mean(axis=-1)
     return {"spectrum": svals.astype(float).tolist(), "sat": pct.astype(float).tolist()}
 
-def whiten_then_procrustes(X_src: np.ndarray, X_tgt: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+class FingerprintAccumulator:
+    """Single-pass dynamics_fingerprint over activation chunks: second moments plus a QuantileSketch."""
+    def __init__(self, dim: int, sketch_k: int = 256, seed: int = 0):
+        self.mom = RunningCovariance(dim)
+        self.sketch = QuantileSketch(dim, k=sketch_k, seed=seed)
+
+    def update(self, acts: np.ndarray) -> "FingerprintAccumulator":
+        self.mom.update(acts)
+        self.sketch.update(acts)
+        return self
+
+    def merge(self, other: "FingerprintAccumulator") -> "FingerprintAccumulator":
+        self.mom.merge(other.mom)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def fingerprint(self) -> Dict[str, Any]:
+        m = self.mom
+        C = (m.C + m.n * np.outer(m.mean, m.mean)) / max(1, m.n-1)  # uncentered, as in dynamics_fingerprint
+        svals = np.linalg.svd(C, compute_uv=False)[:16]
+        pct = self.sketch.quantiles([p / 100.0 for p in SAT_PERCENTILES]).mean(axis=-1)
+        return {"spectrum": svals.astype(float).tolist(), "sat": pct.astype(float).tolist()}
+
+def dynamics_fingerprint_stream(chunks: Iterable[np.ndarray], sketch_k: int = 256) -> Dict[str, Any]:
+    acc = None
+    for acts in chunks:
+        acc = acc or FingerprintAccumulator(acts.shape[1], sketch_k=sketch_k)
+        acc.update(acts)
+    assert acc is not None, "no activations"
+    return acc.fingerprint()
+
+def whiten_then_procrustes(X_src: np.ndarray, X_tgt: np.ndarray, svd: str = "full") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """svd="randomized" computes only the top-k bases instead of the full SVD."""
     Xs, Ws = whiten(X_src)
     Xt, Wt = whiten(X_tgt)
     # Compute bases (top-k right singular vectors)
     ks = min(32, Xs.shape[1], Xs.shape[0])
     kt = min(32, Xt.shape[1], Xt.shape[0])
-    U_s, _, _ = np.linalg.svd(Xs, full_matrices=False)
-    U_t, _, _ = np.linalg.svd(Xt, full_matrices=False)
+    if svd == "randomized":
+        U_s, _, _ = randomized_svd(Xs, ks)
+        U_t, _, _ = randomized_svd(Xt, kt)
+    else:
+        U_s, _, _ = np.linalg.svd(Xs, full_matrices=False)
+        U_t, _, _ = np.linalg.svd(Xt, full_matrices=False)
     k = min(ks, kt)
     R = procrustes_align(U_s[:,:k].T, U_t[:,:k].T)
     return R, Ws, Wt
+
+class StreamingAligner:
+    """whiten_then_procrustes over paired (src, tgt) activation chunks in one pass and O((d_s + d_t)^2) memory.
+    A joint RunningCovariance of [src, tgt] gives both whitening matrices and the whitened cross-covariance.
+    With Xs = U_s S_s V_s^T (and likewise Xt), U_t^T U_s = S_t^-1 V_t^T (Xt^T Xs) V_s S_s^-1, so the
+    sample-space bases never have to be materialized.
+    """
+    def __init__(self, d_src: int, d_tgt: int, k: int = 32, eps: float = 1e-6):
+        self.d_src, self.d_tgt = d_src, d_tgt
+        self.k = k
+        self.eps = eps
+        self.mom = RunningCovariance(d_src + d_tgt)
+
+    def update(self, X_src: np.ndarray, X_tgt: np.ndarray) -> "StreamingAligner":
+        assert X_src.shape[0] == X_tgt.shape[0], "src and tgt chunks must be paired"
+        self.mom.update(np.concatenate([X_src, X_tgt], axis=1))
+        return self
+
+    def merge(self, other: "StreamingAligner") -> "StreamingAligner":
+        self.mom.merge(other.mom)
+        return self
+
+    def _solve(self):
+        ds = self.d_src
+        C = self.mom.cov(ddof=1)
+        Ws = whitening_matrix(C[:ds, :ds], self.eps)
+        Wt = whitening_matrix(C[ds:, ds:], self.eps)
+        k = min(self.k, ds, self.d_tgt, self.mom.n)
+        def basis(G):  # top-k eigenpairs of the whitened Gram matrix = right singular vectors / values^2
+            vals, vecs = np.linalg.eigh(G)
+            top = np.argsort(vals)[::-1][:k]
+            return vecs[:, top], np.sqrt(np.maximum(vals[top], 1e-12))
+        Vs, ss = basis(Ws @ C[:ds, :ds] @ Ws)
+        Vt, st = basis(Wt @ C[ds:, ds:] @ Wt)
+        M = (Vt.T @ (Wt @ C[ds:, :ds] @ Ws) @ Vs) / np.outer(st, ss)  # U_t^T U_s
+        R = orthogonal_procrustes(np.eye(k), M)
+        return C, R, Ws, Wt, (Vs, ss), (Vt, st)
+
+    def finalize(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(R, Ws, Wt) as returned by whiten_then_procrustes."""
+        _, R, Ws, Wt, _, _ = self._solve()
+        return R, Ws, Wt
+
+    def projection(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Feature-space map P (d_src x d_tgt) with x_tgt - mu_tgt ~ (x_src - mu_src) @ P, composed as
+        whiten -> src basis coords -> rotate by R -> tgt basis coords -> unwhiten.
+        Also returns the residual covariance of that prediction and the target covariance (both d_tgt x d_tgt).
+        """
+        ds = self.d_src
+        C, R, Ws, Wt, (Vs, ss), (Vt, st) = self._solve()
+        P = Ws @ (Vs / ss) @ R.T @ (st[:, None] * Vt.T) @ np.linalg.inv(Wt)
+        Css, Ctt, Cst = C[:ds, :ds], C[ds:, ds:], C[:ds, ds:]
+        resid = Ctt - P.T @ Cst - Cst.T @ P + P.T @ Css @ P
+        return P, resid, Ctt
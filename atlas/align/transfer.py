@@ -0,0 +1,92 @@
+
+from __future__ import annotations
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from ..core.spec import AtlasManifest, CircuitDiff, content_address_store, content_address_load
+from ..utils.utils import load_npy_blob, save_npy_blob
+from .alignment import StreamingAligner
+
+def projection_key(target_family: str, src_layer: int, tgt_layer: int, k: int) -> str:
+    """Cache key of a layer projection; k (the aligner's retained rank) changes P, so it is part of the key."""
+    return f"{target_family}:{src_layer}->{tgt_layer}@k{k}"
+
+def _save(arr: np.ndarray, store_fn) -> str:
+    return save_npy_blob(arr, lambda b: store_fn(b, suffix=".npy"))
+
+def layer_projection(manifest: AtlasManifest, target_family: str, src_layer: int, tgt_layer: int,
+                     chunks_fn: Callable[[], Iterable[Tuple[np.ndarray, np.ndarray]]], k: int = 32, force: bool = False,
+                     store_fn=content_address_store, load_fn=content_address_load) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """Projection P (d_src x d_tgt) for one layer pair and the stacked [residual cov, target cov] used for fidelity.
+    Both are cached as blobs under manifest.projections; chunks_fn() (paired (src, tgt) activation chunks)
+    is only called when the cache is missing or force=True. Returns (P, stats, cached).
+    """
+    key = projection_key(target_family, src_layer, tgt_layer, k)
+    if not force and key in manifest.projections and key + "#stats" in manifest.projections:
+        return load_npy_blob(manifest.projections[key], load_fn), load_npy_blob(manifest.projections[key + "#stats"], load_fn), True
+    aligner = None
+    for Xs, Xt in chunks_fn():
+        aligner = aligner or StreamingAligner(Xs.shape[1], Xt.shape[1], k=k)
+        aligner.update(Xs, Xt)
+    assert aligner is not None, f"Empty activations for {key}"
+    P, resid, Ctt = aligner.projection()
+    stats = np.stack([resid, Ctt])
+    manifest.projections[key] = _save(P, store_fn)
+    manifest.projections[key + "#stats"] = _save(stats, store_fn)
+    return P.astype(np.float32), stats.astype(np.float32), False
+
+def _full_basis(c: CircuitDiff, d_src: int, load_fn) -> Optional[np.ndarray]:
+    """Circuit basis as k x d_src rows (U is stored over the support rows only)."""
+    rows = c.support.get("rows", [])
+    if not rows:
+        return None
+    U = load_npy_blob(c.basis_blob, load_fn)
+    B = np.zeros((U.shape[0], d_src), dtype=np.float32)
+    B[:, rows] = U
+    return B
+
+def transfer_atlas(manifest: AtlasManifest, target_family: str, layer_pairs: Dict[int, int],
+                   activations: Callable[[int, int], Iterable[Tuple[np.ndarray, np.ndarray]]],
+                   target_store=None, k: int = 32, force: bool = False,
+                   store_fn=content_address_store, load_fn=content_address_load) -> Dict[str, Any]:
+    """Map every circuit on a source layer in layer_pairs (src -> tgt) into target_family.
+    Per layer pair: one projection (computed from activations(src, tgt) or reused from manifest.projections),
+    one matmul over the stacked bases of all its circuits, and fidelity = 1 - tr(Q^T Cr Q) / tr(Q^T Ct Q)
+    with Q an orthonormal basis of the mapped circuit, Cr the residual and Ct the target covariance.
+    Fidelities go to manifest.families[cid][target_family]; mapped circuits are added to target_store if given.
+    """
+    report: Dict[str, Any] = {"pairs": {}, "mapped": {}}
+    by_layer: Dict[int, List[str]] = {}
+    for cid, c in manifest.circuits.items():
+        layer = c.support.get("layer")
+        if layer in layer_pairs:
+            by_layer.setdefault(layer, []).append(cid)
+    for src, tgt in layer_pairs.items():
+        t0 = time.perf_counter()
+        P, stats, cached = layer_projection(manifest, target_family, src, tgt, lambda: activations(src, tgt),
+                                            k=k, force=force, store_fn=store_fn, load_fn=load_fn)
+        resid, Ctt = stats
+        ids, bases = [], []
+        for cid in by_layer.get(src, []):
+            B = _full_basis(manifest.circuits[cid], P.shape[0], load_fn)
+            if B is not None:
+                ids.append(cid); bases.append(B)
+        mapped = np.concatenate(bases) @ P if bases else np.zeros((0, P.shape[1]), dtype=np.float32)
+        ends = np.cumsum([b.shape[0] for b in bases])
+        for cid, Bt in zip(ids, np.split(mapped, ends[:-1])):
+            Q, _ = np.linalg.qr(Bt.T.astype(np.float64))  # d_tgt x k
+            den = float(np.sum(Q * (Ctt @ Q)))
+            fid = 1.0 - float(np.sum(Q * (resid @ Q))) / den if den > 1e-12 else 0.0
+            manifest.families.setdefault(cid, {})[target_family] = float(np.clip(fid, 0.0, 1.0))
+            ref = _save(Bt, store_fn)
+            report["mapped"][cid] = ref
+            if target_store is not None:
+                c = manifest.circuits[cid]
+                target_store.add_circuit(CircuitDiff(
+                    circuit_id=cid,
+                    support=dict(c.support, layer=tgt, rows=list(range(P.shape[1])), cols=[]),
+                    basis_blob=ref, deltas=dict(c.deltas), prereq=list(c.prereq), conflicts=list(c.conflicts),
+                    tests=list(c.tests), effect_sig=list(c.effect_sig), status="provisional"))
+        report["pairs"][projection_key(target_family, src, tgt, k)] = {"cached": cached, "circuits": len(ids), "seconds": time.perf_counter() - t0}
+    manifest.lineage.append({"op": "transfer", "target": target_family, "pairs": sorted(report["pairs"]), "time": time.time()})
+    return report
@@ -0,0 +1,32 @@
+from __future__ import annotations
+import argparse, json, sys
+from dataclasses import fields, replace
+from .run import BENCHMARKS, compare, format_comparison, run_suite
+from .workloads import SCALES, Scale
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(prog="python -m atlas.bench", description="Time atlas workloads at a configurable scale.")
+    ap.add_argument("--scale", choices=sorted(SCALES), default="small")
+    for f in fields(Scale):
+        ap.add_argument("--" + f.name.replace("_", "-"), type=int, default=None, help=f"override {f.name}")
+    ap.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), default=None)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--warmup", type=int, default=1)
+    ap.add_argument("--out", default=None, help="write the JSON report here (default: stdout)")
+    ap.add_argument("--baseline", default=None, help="JSON report to compare against; exit 1 on regression")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    ap.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    a = ap.parse_args()
+    scale = replace(SCALES[a.scale], **{f.name: getattr(a, f.name) for f in fields(Scale) if getattr(a, f.name) is not None})
+    report = run_suite(scale, a.only, repeat=a.repeat, warmup=a.warmup)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if a.out:
+        with open(a.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    elif not a.baseline:
+        print(text)
+    if a.baseline:
+        with open(a.baseline, "r", encoding="utf-8") as f:
+            cmp = compare(report, json.load(f), tolerance=a.tolerance, min_delta=a.min_delta_ms / 1e3)
+        print(format_comparison(cmp))
+        sys.exit(1 if cmp["regressions"] else 0)
@@ -0,0 +1,183 @@
+
+from __future__ import annotations
+import copy, gc, os, platform, shutil, statistics, tempfile, time
+from dataclasses import asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from ..core.atlas_store import AtlasStore
+from ..core.blobstore import ShardedBlobStore
+from ..core.hierarchy import decompose
+from ..discover.mine import differential_salience, iterative_prune_preserve
+from ..plan.knob_solver import solve_knobs
+from ..plan.planner_obj import Planner
+from ..txn.runtime import apply_plan_with_invariants
+from ..utils.utils import load_npy_blob, save_npy_blob
+from .workloads import Scale, make_atlas, make_model, make_prompts
+
+# A benchmark maps (scale, workdir) to (fn, per_call_setup). per_call_setup() runs untimed before every
+# timed call and its result is passed to fn; None means fn takes no argument.
+Bench = Callable[[Scale, str], Tuple[Callable, Optional[Callable[[], Any]]]]
+BENCHMARKS: Dict[str, Bench] = {}
+
+def benchmark(name: str):
+    def register(fn: Bench) -> Bench:
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+@benchmark("encoder.encode")
+def _encode(scale, workdir):
+    model = make_model(scale)
+    texts = make_prompts(scale)[0]
+    enc = model.encoder
+    def run():
+        if enc.cache is not None:
+            enc.cache.clear()  # measure hashing, not cache hits
+        for t in texts:
+            enc.encode(t)
+    return run, None
+
+@benchmark("model.forward")
+def _forward(scale, workdir):
+    model = make_model(scale)
+    texts = make_prompts(scale)[0]
+    model.forward(texts)  # encodings cached, so this isolates the MLP
+    return (lambda: model.forward(texts)), None
+
+@benchmark("discover.differential_salience")
+def _salience(scale, workdir):
+    model = make_model(scale)
+    pos, neg = make_prompts(scale)
+    return (lambda: differential_salience(model, "hedging", pos, neg)), None
+
+@benchmark("discover.iterative_prune_preserve")
+def _prune(scale, workdir):
+    model = make_model(scale)
+    pos, neg = make_prompts(scale)
+    sal = differential_salience(model, "hedging", pos, neg)["H1"]
+    return (lambda: iterative_prune_preserve(model, "hedging", pos, neg, sal, keep_frac=0.2)), None
+
+@benchmark("plan.solve_knobs")
+def _knobs(scale, workdir):
+    atlas = make_atlas(scale, os.path.join(workdir, "knobs.json")).manifest
+    leaves = decompose(atlas, "persona/bench@v1")
+    targets = {"hedging": 0.6, "formality": 0.5, "refusal": 0.2}
+    return (lambda: solve_knobs(atlas, leaves, targets=targets, max_mag=0.8)), None
+
+@benchmark("plan.build_plans")
+def _plans(scale, workdir):
+    atlas = make_atlas(scale, os.path.join(workdir, "plans.json")).manifest
+    targets = list(atlas.circuits)
+    return (lambda: Planner(atlas).build_plans(targets, 0.5)), None
+
+def _store_bench(fmt: str) -> Bench:
+    def bench(scale, workdir):
+        suffix = ".atlasb" if fmt == "binary" else ".json"
+        src = make_atlas(scale, os.path.join(workdir, f"src_{fmt}{suffix}"))
+        def run():
+            store = AtlasStore(os.path.join(workdir, f"atlas_{fmt}{suffix}"), fmt=fmt)
+            store.manifest = src.manifest
+            store.save()
+            m = store.load()
+            try:
+                for cid in m.circuits:
+                    m.circuits[cid]
+            finally:
+                if hasattr(m.circuits, "close"):
+                    m.circuits.close()  # binary manifests hold an mmap and file handle
+        return run, None
+    return bench
+
+BENCHMARKS["store.save_load.json"] = _store_bench("json")
+BENCHMARKS["store.save_load.binary"] = _store_bench("binary")
+
+@benchmark("blobs.store_load")
+def _blobs(scale, workdir):
+    rng = np.random.RandomState(scale.seed)
+    arrays = [rng.randn(scale.blob_elems).astype(np.float32) for _ in range(8)]
+    root = os.path.join(workdir, "blobs")
+    def setup():
+        shutil.rmtree(root, ignore_errors=True)  # every call writes fresh blobs
+        return ShardedBlobStore(root)
+    def run(store):
+        refs = [save_npy_blob(a, lambda b: store.put(b, suffix=".npy")) for a in arrays]
+        for r in refs:
+            load_npy_blob(r, store.get, use_cache=False)
+    return run, setup
+
+@benchmark("txn.apply_plan_with_invariants")
+def _apply(scale, workdir):
+    model = make_model(scale)
+    atlas = make_atlas(scale, os.path.join(workdir, "apply.json")).manifest
+    leaves = decompose(atlas, "persona/bench@v1")
+    knobs = solve_knobs(atlas, leaves, targets={"hedging": 0.6, "formality": 0.5, "refusal": 0.2}, max_mag=0.8)
+    def setup():
+        plan = Planner(atlas).build_plan("persona/bench@v1", magnitude=0.0)
+        plan.circuits, plan.knobs, plan.atlas = leaves, knobs, atlas
+        return copy.deepcopy(model), plan
+    def run(state):
+        apply_plan_with_invariants(*state)
+    return run, setup
+
+def time_call(fn: Callable, setup: Optional[Callable[[], Any]] = None, repeat: int = 5, warmup: int = 1) -> Dict[str, float]:
+    """Wall-clock seconds of fn over repeat timed calls (after warmup untimed ones), GC disabled while timing."""
+    samples = []
+    for i in range(warmup + repeat):
+        arg = setup() if setup is not None else None
+        gc.collect(); gc.disable()
+        try:
+            t0 = time.perf_counter()
+            fn(arg) if setup is not None else fn()
+            dt = time.perf_counter() - t0
+        finally:
+            gc.enable()
+        if i >= warmup:
+            samples.append(dt)
+    return {"median": statistics.median(samples), "min": min(samples), "mean": statistics.fmean(samples),
+            "max": max(samples), "repeat": repeat}
+
+def run_suite(scale: Scale, names: Optional[List[str]] = None, repeat: int = 5, warmup: int = 1,
+              workdir: Optional[str] = None) -> Dict[str, Any]:
+    """Run the selected benchmarks (all by default) and return a JSON-serializable report."""
+    own = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="atlas-bench-")
+    results = {}
+    try:
+        for name in names or list(BENCHMARKS):
+            fn, setup = BENCHMARKS[name](scale, workdir)
+            results[name] = time_call(fn, setup, repeat=repeat, warmup=warmup)
+    finally:
+        if own:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return {"scale": asdict(scale), "results": results, "created": time.time(),
+            "env": {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(), "cpus": os.cpu_count()}}
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2, stat: str = "median",
+            min_delta: float = 1e-3) -> Dict[str, Any]:
+    """Per-benchmark ratio current/baseline of stat. A regression is a ratio above 1 + tolerance that is also
+    at least min_delta seconds slower (so sub-millisecond jitter is ignored).
+    Benchmarks missing from either report are listed but never count as regressions."""
+    rows, regressions = {}, []
+    for name, res in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            rows[name] = {"current": res[stat], "baseline": None, "ratio": None}
+            continue
+        ratio = res[stat] / max(base[stat], 1e-12)
+        rows[name] = {"current": res[stat], "baseline": base[stat], "ratio": ratio}
+        if ratio > 1.0 + tolerance and res[stat] - base[stat] >= min_delta:
+            regressions.append(name)
+    return {"stat": stat, "tolerance": tolerance, "min_delta": min_delta, "benchmarks": rows, "regressions": regressions,
+            "missing": sorted(set(baseline.get("results", {})) - set(current["results"])),
+            "same_scale": current.get("scale") == baseline.get("scale")}
+
+def format_comparison(cmp: Dict[str, Any]) -> str:
+    lines = [f"{'benchmark':40s} {'baseline':>10s} {'current':>10s} {'ratio':>7s}"]
+    for name, r in cmp["benchmarks"].items():
+        base = f"{r['baseline']*1e3:9.2f}ms" if r["baseline"] is not None else f"{'-':>11s}"
+        ratio = f"{r['ratio']:6.2f}x" if r["ratio"] is not None else f"{'new':>7s}"
+        flag = "  REGRESSION" if name in cmp["regressions"] else ""
+        lines.append(f"{name:40s} {base} {r['current']*1e3:9.2f}ms {ratio}{flag}")
+    if not cmp["same_scale"]:
+        lines.append("warning: baseline was recorded at a different scale")
+    return "\n".join(lines)
@@ -0,0 +1,85 @@
+
+from __future__ import annotations
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+import numpy as np
+from ..semantics.encoder import ByteNGramEncoder
+from ..models.mock import MockBehaviorModel
+from ..core.atlas_store import AtlasStore
+from ..core.hierarchy import add_level_tag
+from ..core.spec import CircuitDiff
+
+BEHAVIORS = ["hedging", "formality", "refusal"]
+
+@dataclass(frozen=True)
+class Scale:
+    enc_dim: int = 256
+    d_hidden: int = 64
+    n_prompts: int = 256        # per side (pos / neg)
+    n_circuits: int = 64
+    dag_depth: int = 3          # internal levels above the leaf circuits
+    dag_fanout: int = 4
+    rows_per_circuit: int = 8
+    blob_elems: int = 1 << 16   # float32 elements per benchmark blob
+    seed: int = 0
+
+SCALES: Dict[str, Scale] = {
+    "tiny": Scale(enc_dim=64, d_hidden=16, n_prompts=16, n_circuits=8, dag_depth=2, dag_fanout=2, rows_per_circuit=4, blob_elems=1 << 10),
+    "small": Scale(enc_dim=128, d_hidden=32, n_prompts=64, n_circuits=24, dag_depth=2, dag_fanout=3, rows_per_circuit=6, blob_elems=1 << 14),
+    "medium": Scale(),
+    "large": Scale(enc_dim=1024, d_hidden=256, n_prompts=2048, n_circuits=1024, dag_depth=5, dag_fanout=4, rows_per_circuit=16, blob_elems=1 << 20),
+}
+
+WORDS = {
+    "hedging": (["maybe", "perhaps", "it might", "possibly"], ["clearly", "definitely", "certainly", "obviously"]),
+    "formality": (["therefore", "moreover", "thus", "consequently"], ["yeah", "btw", "kinda", "tbh"]),
+    "refusal": (["I cannot comply.", "I won't do that.", "That would be inappropriate."], ["Sure, here's how.", "Absolutely.", "Yes, proceeding."]),
+}
+
+def make_prompts(scale: Scale, behavior: str = "hedging") -> Tuple[List[str], List[str]]:
+    """n_prompts synthetic (pos, neg) texts for behavior, differing only in the marker phrase."""
+    rng = np.random.RandomState(scale.seed)
+    up, down = WORDS[behavior]
+    subjects = ["rain", "snow", "wind", "the market", "the report", "traffic", "the launch"]
+    pos, neg = [], []
+    for i in range(scale.n_prompts):
+        s = subjects[rng.randint(len(subjects))]
+        pos.append(f"Note {i}: {up[rng.randint(len(up))]} {s} will change later today.")
+        neg.append(f"Note {i}: {down[rng.randint(len(down))]} {s} will change later today.")
+    return pos, neg
+
+def make_model(scale: Scale) -> MockBehaviorModel:
+    return MockBehaviorModel(ByteNGramEncoder(dim=scale.enc_dim), d_hidden=scale.d_hidden, seed=42 + scale.seed)
+
+def make_atlas(scale: Scale, path: str) -> AtlasStore:
+    """n_circuits leaf circuits (behaviors round-robin, random row supports) under a tree dag_depth levels deep
+    with the given fan-out, rooted at "persona/bench@v1". Internal nodes are circuits too (composite, then
+    persona level) supported on the union of their children's rows, so every node is a valid plan target."""
+    rng = np.random.RandomState(scale.seed)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    store = AtlasStore(path).new(family="mock_residual")
+    def add(cid: str, rows: List[int], level: str, behavior: str) -> None:
+        store.add_circuit(add_level_tag(CircuitDiff(circuit_id=cid, support={"layer": 1, "type": "mlp", "rows": rows, "cols": []},
+                                                    basis_blob="", deltas={behavior: [1.0] * len(rows)},
+                                                    effect_sig=rng.randn(8).tolist()), level))
+    level, rows_of = [], {}
+    for i in range(scale.n_circuits):
+        b = BEHAVIORS[i % len(BEHAVIORS)]
+        cid = f"behavior/{b}/{i}@v1"
+        rows_of[cid] = sorted(rng.choice(scale.d_hidden, size=min(scale.rows_per_circuit, scale.d_hidden), replace=False).tolist())
+        add(cid, rows_of[cid], "behavioral", b)
+        level.append(cid)
+    for d in range(scale.dag_depth, -1, -1):
+        n_parents = 1 if d == 0 else max(1, -(-len(level) // scale.dag_fanout))
+        parents = ["persona/bench@v1"] if d == 0 else [f"composite/{d}/{j}@v1" for j in range(n_parents)]
+        groups: Dict[str, List[str]] = {p: [] for p in parents}
+        for j, child in enumerate(level):
+            groups[parents[min(j // scale.dag_fanout, n_parents - 1)]].append(child)
+        for parent, children in groups.items():
+            rows_of[parent] = sorted(set().union(*(rows_of[c] for c in children)))
+            add(parent, rows_of[parent], "persona" if d == 0 else "composite", "mixed")
+            for child in children:
+                store.add_edge(parent, child)
+        level = parents
+    return store
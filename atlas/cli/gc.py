@@ -0,0 +1,23 @@
+
+from __future__ import annotations
+import argparse
+from typing import List, Optional
+from atlas.core.blobstore import collect_garbage
+
+def gc_blobs(manifests: List[str], blob_dir: Optional[str] = None, archive: Optional[str] = None, dry_run: bool = False, grace_seconds: float = 600.0) -> str:
+    rep = collect_garbage(manifests, root=blob_dir, archive_dir=archive, dry_run=dry_run, grace_seconds=grace_seconds)
+    action = "would sweep" if dry_run else ("archived" if archive else "removed")
+    lines = [f"Referenced blobs: {rep['marked']} | scanned: {rep['scanned']} | within grace period: {rep['young']}",
+             f"{action} {len(rep['swept'])} blobs ({rep['bytes_freed']} bytes)"]
+    lines += [f"  - {ref}" for ref in rep["swept"]]
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Remove or archive blobs no manifest references.")
+    ap.add_argument("manifests", nargs="+")
+    ap.add_argument("--blob-dir", default=None)
+    ap.add_argument("--archive", default=None)
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--grace-seconds", type=float, default=600.0)
+    a = ap.parse_args()
+    print(gc_blobs(a.manifests, a.blob_dir, a.archive, a.dry_run, a.grace_seconds))
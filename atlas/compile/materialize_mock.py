@@ -1,7 +1,7 @@
 
 import numpy as np
-from typing import Dict
-from .stability import spectral_norm
+from typing import Dict, Optional
+from .stability import SpectralNormEstimator
 
 def materialize_mask_as_w2_delta(model, mask, head_idx: int, magnitude: float = 0.1) -> np.ndarray:
     """Create a delta for W2[:, head_idx] on masked rows."""
@@ -13,17 +13,32 @@ def materialize_mask_as_w2_delta(model, mask, head_idx: int, magnitude: float =
         dW[rows, head_idx] += vec
     return dW
 
-def safe_apply_w2_delta(model, dW2: np.ndarray, beta: float = 1.2) -> Dict[str, float]:
+def safe_apply_w2_delta(model, dW2: np.ndarray, beta: float = 1.2, estimator: Optional[SpectralNormEstimator] = None) -> Dict[str, float]:
     """Scale and apply dW2 to keep spectral norm within beta * base.
+    Share one estimator across the circuits of a plan so each norm warm-starts from the last one.
+    When the Weyl bound base + ||dW2||_F already meets the budget, the trial norm is not computed
+    and "trial" reports that bound.
     Returns a report with per-application margins.
     """
-    base = spectral_norm(model.W2)
-    trial = spectral_norm(model.W2 + dW2)
-    if trial <= beta * max(1e-6, base):
+    est = estimator or SpectralNormEstimator()
+    W2 = model.W2
+    base = est.estimate(W2, key="W2")
+    bound = est.upper_bound("W2", dW2)
+    skipped = bound <= beta * max(1e-6, base)
+    if skipped:
+        est.stats["bound_skips"] += 1
+        trial = bound
         gamma = 1.0
     else:
-        gamma = (beta * base) / (trial + 1e-8)
-    model.W2 = model.W2 + gamma * dW2
-    final = spectral_norm(model.W2)
+        trial = est.estimate(W2 + dW2, key="W2")
+        if trial <= beta * max(1e-6, base):
+            gamma = 1.0
+        else:
+            gamma = (beta * base) / (trial + 1e-8)
+    if hasattr(model, "add_w2_delta"):
+        model.add_w2_delta(gamma * dW2)  # overlay: touch only the edited rows
+    else:
+        model.W2 = W2 + gamma * dW2
+    final = est.estimate(model.W2, key="W2")
     util = final / (beta * max(base, 1e-6))  # utilization of spectral budget
-    return {"gamma": float(gamma), "base": float(base), "trial": float(trial), "final": float(final), "utilization": float(util)}
+    return {"gamma": float(gamma), "base": float(base), "trial": float(trial), "final": float(final), "utilization": float(util), "skipped": bool(skipped)}
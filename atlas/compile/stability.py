@@ -1,6 +1,6 @@
 
-import numpy as np
-from typing import Tuple
+import numpy as np, hashlib
+from typing import Any, Dict, Optional, Tuple
 
 def spectral_norm(A: np.ndarray, n_iter: int = 2) -> float:
     x = np.random.randn(A.shape[1]).astype(np.float32)
@@ -10,13 +10,72 @@ def spectral_norm(A: np.ndarray, n_iter: int = 2) -> float:
         x /= (np.linalg.norm(x) + 1e-8)
     return float(np.linalg.norm(A @ x))
 
-def cap_spectral(W: np.ndarray, dW: np.ndarray, beta: float = 0.9) -> float:
+class SpectralNormEstimator:
+    """Seeded power-iteration estimator of ||A||_2 that iterates to a relative tolerance.
+    Per key it caches the dominant right singular vector (used to warm-start the next estimate after
+    a small update) and the estimate itself, which is reused while the matrix content is unchanged.
+    """
+    def __init__(self, tol: float = 1e-6, max_iter: int = 500, seed: int = 0):
+        self.tol = tol
+        self.max_iter = max_iter
+        self.rng = np.random.RandomState(seed)
+        self._cache: Dict[Any, Tuple[np.ndarray, float, bytes]] = {}  # key -> (vector, sigma, fingerprint)
+        self.stats = {"estimates": 0, "reused": 0, "warm_starts": 0, "iterations": 0, "bound_skips": 0}
+
+    @staticmethod
+    def _fingerprint(A: np.ndarray) -> bytes:
+        A = np.ascontiguousarray(A)
+        h = hashlib.blake2b(repr((A.shape, A.dtype.str)).encode(), digest_size=16)
+        h.update(A.data)
+        return h.digest()
+
+    def estimate(self, A: np.ndarray, key: Any = None) -> float:
+        self.stats["estimates"] += 1
+        fp = self._fingerprint(A) if key is not None else None
+        cached = self._cache.get(key) if key is not None else None
+        if cached is not None and cached[2] == fp:
+            self.stats["reused"] += 1
+            return cached[1]
+        if cached is not None and cached[0].shape == (A.shape[1],):
+            x = cached[0].astype(np.float64)
+            self.stats["warm_starts"] += 1
+        else:
+            x = self.rng.randn(A.shape[1])
+        x /= (np.linalg.norm(x) + 1e-12)
+        sigma = 0.0
+        for _ in range(self.max_iter):
+            self.stats["iterations"] += 1
+            y = A @ x
+            new = float(np.linalg.norm(y))
+            x = A.T @ y
+            x /= (np.linalg.norm(x) + 1e-12)
+            done = abs(new - sigma) <= self.tol * max(new, 1e-12)
+            sigma = new
+            if done:
+                break
+        if key is not None:
+            self._cache[key] = (x, sigma, fp)
+        return sigma
+
+    def upper_bound(self, key: Any, dA: np.ndarray) -> Optional[float]:
+        """Weyl bound ||A + dA||_2 <= ||A||_2 + ||dA||_F for the last matrix estimated under key."""
+        cached = self._cache.get(key)
+        return None if cached is None else cached[1] + float(np.linalg.norm(dA))
+
+    def forget(self, key: Any) -> None:
+        self._cache.pop(key, None)
+
+def cap_spectral(W: np.ndarray, dW: np.ndarray, beta: float = 0.9, estimator: Optional[SpectralNormEstimator] = None) -> float:
     """Return scale gamma in (0,1] such that ||W + gamma dW||_2 <= beta * ||W||_2."""
-    base = spectral_norm(W)
+    est = estimator or SpectralNormEstimator()
+    base = est.estimate(W, key="cap")
     if base <= 1e-8:
         return 1.0
     gamma = 1.0
-    trial = spectral_norm(W + dW)
+    if est.upper_bound("cap", dW) <= beta * base:
+        est.stats["bound_skips"] += 1
+        return 1.0
+    trial = est.estimate(W + dW, key="cap")
     if trial <= beta * base:
         return 1.0
     # scale down dW
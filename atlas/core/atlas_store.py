@@ -1,49 +1,190 @@
 
 from __future__ import annotations
-import json, os
+import hashlib, json, os, threading, time
+from dataclasses import fields
 from typing import Dict, List, Optional
 from .spec import AtlasManifest, CircuitDiff, content_address_store, content_address_load
+from .manifest_bin import BINARY_SUFFIX, read_binary_manifest, write_binary_manifest
+from .dag_index import dag_index
 
 class AtlasStore:
-    def __init__(self, path: str):
+    def __init__(self, path: str, fmt: Optional[str] = None, journal: bool = False, group_commit: int = 64, sync_interval: float = 1.0,
+                 read_only: bool = False):
+        """fmt: "json" or "binary" (indexed, lazily decoded); inferred from the path suffix if None.
+        journal=True: add_circuit/add_edge append records to path + ".journal" instead of requiring a full
+        rewrite. Records are fsynced in groups of `group_commit`, or by the first append made `sync_interval`
+        seconds after the last sync; there is no background timer, so the tail of a writer that goes quiet
+        stays pending until flush(), save() or close() (`with AtlasStore(...) as store:` closes on exit).
+        Only circuits and edges are journaled: save() writes a full snapshot when any other manifest field
+        (projections, families, lineage, sign, ...) changed. compact() folds the journal into the snapshot.
+        read_only=True stores only load() and never touch the files (collect_garbage uses them while writers
+        may be live).
+        """
         self.path = path
+        self.fmt = fmt or ("binary" if path.endswith(BINARY_SUFFIX) else "json")
         self.manifest: Optional[AtlasManifest] = None
+        self.journal = journal
+        self.journal_path = path + ".journal"
+        self.group_commit = group_commit
+        self.sync_interval = sync_interval
+        self._pending: List[bytes] = []
+        self._last_sync = time.monotonic()
+        self._jf = None
+        self._meta: Optional[str] = None
+        self.read_only = read_only
+        self._journal_end: Optional[int] = None  # end of the last complete record seen by _replay
+        self._lock = threading.Lock()
         os.makedirs(os.path.dirname(path), exist_ok=True)
 
     def new(self, version: str = "v0.1", family: str = "mock_residual", token_semantics: Dict = None):
+        assert not self.read_only, "read-only store"
         self.manifest = AtlasManifest(version=version, family=family, projections={}, circuits={}, dag={}, token_semantics=token_semantics or {})
+        if self.journal:
+            # A new atlas starts with an empty snapshot and log, so a crash before the first save() still
+            # loads, and records of a previous atlas at this path cannot replay
+            self.close()
+            self.compact()
         return self
 
     def add_circuit(self, c: CircuitDiff):
         assert self.manifest is not None
         self.manifest.circuits[c.circuit_id] = c
+        self.manifest.bump_version("circuits")
+        if self.journal:
+            self._append({"op": "circuit", "c": json.loads(c.to_json())})
 
     def add_edge(self, parent: str, child: str):
+        """Raises ValueError (leaving the atlas unchanged) if the edge would close a cycle."""
         assert self.manifest is not None
+        idx = dag_index(self.manifest)
+        idx.add_edge(parent, child)
         self.manifest.dag.setdefault(parent, []).append(child)
+        idx.version = self.manifest.bump_version("dag")
+        if self.journal:
+            self._append({"op": "edge", "p": parent, "c": child})
 
-    def save(self):
-        assert self.manifest is not None
-        with open(self.path, "w", encoding="utf-8") as f:
+    # --- journal -------------------------------------------------------------
+    def _append(self, rec: Dict) -> None:
+        assert not self.read_only, "read-only store"
+        line = json.dumps(rec, sort_keys=True, ensure_ascii=False, separators=(",",":")).encode("utf-8") + b"\n"
+        with self._lock:
+            self._pending.append(line)
+            due = len(self._pending) >= self.group_commit or time.monotonic() - self._last_sync >= self.sync_interval
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        """Group commit: write all pending journal records and fsync once."""
+        with self._lock:
+            if self._pending:
+                if self._jf is None:
+                    self._jf = open(self.journal_path, "ab")
+                    if self._journal_end is not None and self._jf.tell() > self._journal_end:
+                        self._jf.truncate(self._journal_end)  # torn tail skipped by _replay; append after the last record
+                self._jf.write(b"".join(self._pending))
+                self._jf.flush(); os.fsync(self._jf.fileno())
+                self._pending = []
+            self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+        if self._jf is not None:
+            self._jf.close(); self._jf = None
+
+    def __enter__(self) -> "AtlasStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _replay(self) -> int:
+        """Apply journal records on top of the loaded snapshot. A torn tail record (crash, or a writer
+        mid-append) is skipped but left on disk: this store's first flush() cuts it before appending, and
+        compact() rewrites the journal. Replay is idempotent, so a crash during compact() is harmless.
+        """
+        if not os.path.exists(self.journal_path):
+            return 0
+        n, good = 0, 0
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    rec = None
+                if rec is None:
+                    break
+                if rec["op"] == "circuit":
+                    self.manifest.circuits[rec["c"]["circuit_id"]] = CircuitDiff(**rec["c"])
+                elif rec["op"] == "edge":
+                    children = self.manifest.dag.setdefault(rec["p"], [])
+                    if rec["c"] not in children:
+                        children.append(rec["c"])
+                good += len(line); n += 1
+        self._journal_end = good
+        return n
+
+    def compact(self) -> str:
+        """Fold the journal into a fresh snapshot, then truncate the journal."""
+        assert self.manifest is not None and not self.read_only
+        self.flush()
+        self._write_snapshot()
+        with self._lock:
+            if self._jf is not None:
+                self._jf.close(); self._jf = None
+            with open(self.journal_path, "wb") as f:
+                os.fsync(f.fileno())
+            self._journal_end = 0
+        return self.path
+
+    # --- snapshot ------------------------------------------------------------
+    def _meta_digest(self) -> str:
+        """Hash of the manifest fields the journal does not record (all but circuits and dag)."""
+        meta = {f.name: getattr(self.manifest, f.name) for f in fields(AtlasManifest) if f.name not in ("circuits", "dag")}
+        return hashlib.sha256(json.dumps(meta, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _write_snapshot(self) -> str:
+        self._meta = self._meta_digest()
+        if self.fmt == "binary":
+            return write_binary_manifest(self.manifest, self.path)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
             f.write(self.manifest.to_json())
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp, self.path)
         return self.path
 
+    def save(self):
+        assert self.manifest is not None and not self.read_only
+        if self.journal:
+            # The log only carries circuits and edges; any other change needs a full snapshot
+            if not os.path.exists(self.path) or self._meta != self._meta_digest():
+                return self.compact()
+            self.flush()
+            return self.path
+        return self._write_snapshot()
+
     def load(self):
-        with open(self.path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        # reconstruct CircuitDiffs
-        circuits = {}
-        for k, v in data["circuits"].items():
-            circuits[k] = CircuitDiff(**v)
-        self.manifest = AtlasManifest(
-            version=data["version"],
-            family=data["family"],
-            projections=data["projections"],
-            circuits=circuits,
-            dag=data["dag"],
-            token_semantics=data.get("token_semantics", {}),
-            families=data.get("families", {}),
-            lineage=data.get("lineage", []),
-            sign=data.get("sign"),
-        )
+        if self.fmt == "binary":
+            self.manifest = read_binary_manifest(self.path)
+        else:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            # reconstruct CircuitDiffs
+            circuits = {}
+            for k, v in data["circuits"].items():
+                circuits[k] = CircuitDiff(**v)
+            self.manifest = AtlasManifest(
+                version=data["version"],
+                family=data["family"],
+                projections=data["projections"],
+                circuits=circuits,
+                dag=data["dag"],
+                token_semantics=data.get("token_semantics", {}),
+                families=data.get("families", {}),
+                lineage=data.get("lineage", []),
+                sign=data.get("sign"),
+            )
+        if self.journal:
+            self._replay()
+            self._meta = self._meta_digest()
         return self.manifest
@@ -0,0 +1,149 @@
+
+from __future__ import annotations
+import hashlib, os, re, tempfile, time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from . import spec
+from .spec import atomic_write
+
+REF_RE = re.compile(r"^sha256:([0-9a-f]{64})(\.[A-Za-z0-9]+)?$")
+
+def parse_ref(ref: str) -> Tuple[str, str]:
+    """'sha256:<hex><suffix>' -> (hex, suffix)."""
+    m = REF_RE.match(ref)
+    assert m is not None, f"Unsupported ref: {ref}"
+    return m.group(1), m.group(2) or ""
+
+class _HashingWriter:
+    """File-like sink that hashes everything written through it."""
+    def __init__(self, f):
+        self.f = f
+        self.h = hashlib.sha256()
+    def write(self, b) -> int:
+        self.h.update(b)
+        return self.f.write(b)
+
+class ShardedBlobStore:
+    """Content-addressed blobs under hash-prefix shard directories (root/ab/cd/<sha256><suffix>).
+    Writes are atomic, arrays are hashed while they stream to disk, and .npy blobs can be loaded as
+    read-only memory maps. Refs are the same 'sha256:<hex><suffix>' strings as content_address_store,
+    and blobs still sitting flat in root (the legacy layout) remain readable.
+    """
+    def __init__(self, root: Optional[str] = None, depth: int = 2, width: int = 2):
+        self.root = root or spec.BLOB_DIR
+        self.depth = depth
+        self.width = width
+
+    def path_for(self, h: str, suffix: str) -> str:
+        shards = [h[i*self.width:(i+1)*self.width] for i in range(self.depth)]
+        return os.path.join(self.root, *shards, f"{h}{suffix}")
+
+    def locate(self, ref: str) -> Optional[str]:
+        h, suffix = parse_ref(ref)
+        for p in (self.path_for(h, suffix), os.path.join(self.root, f"{h}{suffix}")):
+            if os.path.exists(p):
+                return p
+        return None
+
+    def exists(self, ref: str) -> bool:
+        return self.locate(ref) is not None
+
+    def put(self, data: bytes, suffix: str = ".bin") -> str:
+        h = spec.sha256_bytes(data)
+        p = self.path_for(h, suffix)
+        try:
+            os.utime(p)  # dedup hit: restart collect_garbage's grace period for this writer
+        except FileNotFoundError:
+            atomic_write(p, [data])
+        return f"sha256:{h}{suffix}"
+
+    def put_stream(self, write_fn, suffix: str = ".bin") -> str:
+        """Store whatever write_fn(fileobj) writes, hashing it on the way to a temp file.
+        The blob is never held in memory as a whole."""
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                w = _HashingWriter(f)
+                write_fn(w)
+                f.flush(); os.fsync(f.fileno())
+            h = w.h.hexdigest()
+            p = self.path_for(h, suffix)
+            try:
+                os.utime(p)
+                os.remove(tmp)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(p), exist_ok=True)
+                os.replace(tmp, p)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return f"sha256:{h}{suffix}"
+
+    def put_array(self, arr: np.ndarray, dtype=np.float32) -> str:
+        """Store arr as .npy (byte-identical to np.save, so refs match save_npy_blob)."""
+        a = np.asarray(arr) if dtype is None else np.asarray(arr).astype(dtype, copy=False)
+        return self.put_stream(lambda f: np.lib.format.write_array(f, a, allow_pickle=False), suffix=".npy")
+
+    def get(self, ref: str) -> bytes:
+        p = self.locate(ref)
+        if p is None:
+            raise FileNotFoundError(ref)
+        with open(p, "rb") as f:
+            return f.read()
+
+    def load_array(self, ref: str, mmap: bool = True) -> np.ndarray:
+        """Load a .npy blob; with mmap=True it is a read-only np.memmap over the blob file (no copy)."""
+        p = self.locate(ref)
+        if p is None:
+            raise FileNotFoundError(ref)
+        return np.load(p, mmap_mode="r" if mmap else None, allow_pickle=False)
+
+    def iter_refs(self) -> Iterator[Tuple[str, str]]:
+        """Yield (ref, path) for every blob under root, sharded or flat."""
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                m = re.match(r"^([0-9a-f]{64})(\.[A-Za-z0-9]+)?$", name)
+                if m:
+                    yield f"sha256:{name}", os.path.join(dirpath, name)
+
+def referenced_blobs(manifest) -> set:
+    """Every blob ref a manifest points at: circuit bases and layer projections."""
+    refs = {c.basis_blob for c in manifest.circuits.values() if c.basis_blob}
+    refs.update(r for r in manifest.projections.values() if r)
+    return refs
+
+def collect_garbage(manifest_paths: List[str], root: Optional[str] = None, archive_dir: Optional[str] = None,
+                    dry_run: bool = False, grace_seconds: float = 600.0) -> Dict[str, Any]:
+    """Mark-and-sweep GC of blobs under root that no listed manifest references.
+    Unreferenced blobs are deleted, or moved to archive_dir (keeping their relative path).
+    Blobs younger than grace_seconds survive, so writers that have stored a blob but not yet
+    recorded it in a manifest are not raced.
+    """
+    from .atlas_store import AtlasStore
+    store = ShardedBlobStore(root)
+    live = set()
+    for p in manifest_paths:
+        live |= referenced_blobs(AtlasStore(p, journal=os.path.exists(p + ".journal"), read_only=True).load())
+    report = {"marked": len(live), "scanned": 0, "swept": [], "young": 0, "bytes_freed": 0}
+    now = time.time()
+    for ref, path in list(store.iter_refs()):
+        report["scanned"] += 1
+        if ref in live:
+            continue
+        st = os.stat(path)
+        if now - st.st_mtime < grace_seconds:
+            report["young"] += 1
+            continue
+        report["swept"].append(ref)
+        report["bytes_freed"] += st.st_size
+        if dry_run:
+            continue
+        if archive_dir:
+            dst = os.path.join(archive_dir, os.path.relpath(path, store.root))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            os.replace(path, dst)
+        else:
+            os.remove(path)
+    return report
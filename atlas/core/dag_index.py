@@ -0,0 +1,149 @@
+
+from __future__ import annotations
+from typing import Dict, List, Optional
+import numpy as np
+from .spec import AtlasManifest
+
+def _bits(b: int) -> List[int]:
+    """Indices of the set bits of b, lowest first."""
+    if not b:
+        return []
+    raw = np.frombuffer(b.to_bytes((b.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder="little")).tolist()
+
+class DagIndex:
+    """Compiled view of a parent -> children DAG: integer node ids, ancestor/descendant bitsets (Python ints),
+    a cached topological order and memoized leaf lists. add_edge() maintains it incrementally and rejects
+    edges that would close a cycle. Built from (and kept in step with) a manifest's dag dict; `version` is the
+    manifest dag version it reflects.
+    """
+    def __init__(self, dag: Dict[str, List[str]], version: int = 0):
+        self.dag = dag
+        self.version = version
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.children: List[List[int]] = []
+        self.parents: List[List[int]] = []
+        self.anc: List[int] = []
+        self.desc: List[int] = []
+        self._topo: Optional[List[int]] = None
+        self._pos: Optional[List[int]] = None
+        self._leaves: Dict[int, List[str]] = {}
+        for parent, children in dag.items():
+            p = self._id(parent)
+            for ch in children:
+                c = self._id(ch)
+                if c not in self.children[p]:
+                    self.children[p].append(c); self.parents[c].append(p)
+        # Closure in one pass each way over the topological order
+        order = self._order()
+        if len(order) < len(self.names):
+            raise ValueError("dag contains a cycle")
+        for u in order:
+            for p in self.parents[u]:
+                self.anc[u] |= self.anc[p] | (1 << p)
+        for u in reversed(order):
+            for c in self.children[u]:
+                self.desc[u] |= self.desc[c] | (1 << c)
+
+    def _id(self, name: str) -> int:
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.children.append([]); self.parents.append([])
+            self.anc.append(0); self.desc.append(0)
+        return i
+
+    def _link(self, parent: str, child: str) -> bool:
+        p, c = self._id(parent), self._id(child)
+        if c in self.children[p]:
+            return False
+        if p == c or (self.desc[c] >> p) & 1:
+            raise ValueError(f"Edge {parent} -> {child} would create a cycle")
+        self.children[p].append(c); self.parents[c].append(p)
+        up = self.anc[p] | (1 << p)
+        down = self.desc[c] | (1 << c)
+        for d in _bits(down):
+            self.anc[d] |= up
+        for a in _bits(up):
+            self.desc[a] |= down
+            self._leaves.pop(a, None)
+        self._topo = self._pos = None
+        return True
+
+    def add_edge(self, parent: str, child: str) -> bool:
+        """Add parent -> child to the index (not to the dag dict); False if it was already present."""
+        return self._link(parent, child)
+
+    def topo_order(self) -> List[str]:
+        return [self.names[i] for i in self._order()]
+
+    def _order(self) -> List[int]:
+        if self._topo is None:
+            indeg = [len(ps) for ps in self.parents]
+            stack = [i for i in range(len(self.names)) if indeg[i] == 0][::-1]
+            order = []
+            while stack:
+                u = stack.pop()
+                order.append(u)
+                for v in reversed(self.children[u]):
+                    indeg[v] -= 1
+                    if indeg[v] == 0:
+                        stack.append(v)
+            self._topo = order
+            self._pos = [0] * len(order)
+            for k, u in enumerate(order):
+                self._pos[u] = k
+        return self._topo
+
+    def ancestors(self, node: str, include_self: bool = True) -> List[str]:
+        """Ancestors of node in topological order (node last if include_self)."""
+        i = self.ids.get(node)
+        if i is None:
+            return [node] if include_self else []
+        self._order()
+        b = self.anc[i] | ((1 << i) if include_self else 0)
+        return [self.names[j] for j in sorted(_bits(b), key=self._pos.__getitem__)]
+
+    def descendants(self, node: str) -> List[str]:
+        i = self.ids.get(node)
+        if i is None:
+            return []
+        self._order()
+        return [self.names[j] for j in sorted(_bits(self.desc[i]), key=self._pos.__getitem__)]
+
+    def leaves(self, node: str) -> List[str]:
+        """Leaf descendants of node in depth-first order without repeats ([node] for a leaf)."""
+        i = self.ids.get(node)
+        if i is None:
+            return [node]
+        # Iterative post-order over unmemoized descendants, so deep DAGs cannot hit the recursion limit
+        stack = [(i, False)]
+        while stack:
+            u, expanded = stack.pop()
+            if u in self._leaves:
+                continue
+            if not self.children[u]:
+                self._leaves[u] = [self.names[u]]
+            elif expanded:
+                self._leaves[u] = list(dict.fromkeys(x for v in self.children[u] for x in self._leaves[v]))
+            else:
+                stack.append((u, True))
+                stack.extend((v, False) for v in self.children[u] if v not in self._leaves)
+        return list(self._leaves[i])
+
+def dag_index(atlas: AtlasManifest) -> DagIndex:
+    """Cached DagIndex of a manifest (stored on it as ._dag_index), rebuilt when atlas.version_of("dag") moved
+    past it or the dag dict was replaced. AtlasStore.add_edge keeps it current; code editing atlas.dag in place
+    must call atlas.bump_version("dag") or invalidate_dag_index(atlas).
+    """
+    idx = getattr(atlas, "_dag_index", None)
+    if idx is None or idx.dag is not atlas.dag or idx.version != atlas.version_of("dag"):
+        idx = DagIndex(atlas.dag, atlas.version_of("dag"))
+        atlas._dag_index = idx
+    return idx
+
+def invalidate_dag_index(atlas: AtlasManifest) -> None:
+    atlas.bump_version("dag")
+    atlas.__dict__.pop("_dag_index", None)
@@ -2,6 +2,7 @@
 from __future__ import annotations
 from typing import Dict, List
 from .spec import AtlasManifest, CircuitDiff
+from .dag_index import dag_index
 
 LEVELS = ["atomic", "primitive", "composite", "behavioral", "persona"]
 
@@ -15,17 +16,8 @@ def get_level(c: CircuitDiff) -> str:
     return c.support.get("tags", {}).get("level", "primitive")
 
 def decompose(atlas: AtlasManifest, node_id: str) -> List[str]:
-    """Return leaf circuits under node_id via DAG traversal. If node_id is a leaf, return [node_id]."""
-    dag = atlas.dag or {}
-    leaves = []
-    def dfs(u):
-        children = dag.get(u, [])
-        if not children:
-            leaves.append(u); return
-        for v in children:
-            dfs(v)
-    dfs(node_id)
-    return leaves
+    """Return leaf circuits under node_id (depth-first order, each once). If node_id is a leaf, return [node_id]."""
+    return dag_index(atlas).leaves(node_id)
 
 def compose(atlas: AtlasManifest, component_ids: List[str]) -> List[CircuitDiff]:
     return [atlas.circuits[cid] for cid in component_ids if cid in atlas.circuits]
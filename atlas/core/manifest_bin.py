@@ -0,0 +1,168 @@
+
+from __future__ import annotations
+import bisect, json, mmap, os, struct
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+from .spec import AtlasManifest, CircuitDiff
+
+# Binary manifest layout (little endian):
+#   MAGIC | u32 header_len | header JSON (every manifest field except circuits)
+#   u64 n | n index entries (rec_off u64, rec_len u32, id_off u64, id_len u32), sorted by circuit id
+#   circuit ids (utf-8) | circuit records (CircuitDiff.to_json, utf-8)
+# Offsets are absolute, so a record can be decoded straight from a memory map.
+MAGIC = b"ATLASBN1"
+INDEX_DTYPE = np.dtype([("rec_off", "<u8"), ("rec_len", "<u4"), ("id_off", "<u8"), ("id_len", "<u4")])
+BINARY_SUFFIX = ".atlasb"
+
+class _IdView:
+    """Sequence view over the sorted ids of the index, decoding only the probed entries."""
+    def __init__(self, mm, index):
+        self.mm, self.index = mm, index
+    def __len__(self):
+        return len(self.index)
+    def __getitem__(self, i):
+        e = self.index[i]
+        return bytes(self.mm[int(e["id_off"]):int(e["id_off"]) + int(e["id_len"])])
+
+class LazyCircuits(MutableMapping):
+    """circuit_id -> CircuitDiff backed by a memory-mapped binary manifest.
+    Records are decoded on first access; assignments and deletions stay in memory.
+    """
+    def __init__(self, path: str):
+        self._f = open(path, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        hlen = struct.unpack_from("<I", self._mm, len(MAGIC))[0]
+        pos = len(MAGIC) + 4 + hlen
+        n = struct.unpack_from("<Q", self._mm, pos)[0]
+        self._index = np.frombuffer(self._mm, dtype=INDEX_DTYPE, count=n, offset=pos + 8)
+        self._ids = _IdView(self._mm, self._index)
+        self._decoded: Dict[str, CircuitDiff] = {}
+        self._added: Dict[str, CircuitDiff] = {}
+        self._deleted = set()
+
+    def _find(self, cid: str) -> int:
+        key = cid.encode("utf-8")
+        i = bisect.bisect_left(self._ids, key)
+        return i if i < len(self._ids) and self._ids[i] == key else -1
+
+    def raw_record(self, cid: str) -> Optional[bytes]:
+        """Undecoded JSON record of an untouched stored circuit, else None."""
+        if cid in self._added or cid in self._deleted or cid in self._decoded:
+            return None
+        i = self._find(cid)
+        if i < 0:
+            return None
+        e = self._index[i]
+        return bytes(self._mm[int(e["rec_off"]):int(e["rec_off"]) + int(e["rec_len"])])
+
+    def __getitem__(self, cid: str) -> CircuitDiff:
+        if cid in self._added:
+            return self._added[cid]
+        if cid in self._decoded:
+            return self._decoded[cid]
+        raw = None if cid in self._deleted else self.raw_record(cid)
+        if raw is None:
+            raise KeyError(cid)
+        c = CircuitDiff(**json.loads(raw))
+        self._decoded[cid] = c
+        return c
+
+    def __setitem__(self, cid: str, c: CircuitDiff) -> None:
+        self._deleted.discard(cid)
+        self._decoded.pop(cid, None)
+        self._added[cid] = c
+
+    def __delitem__(self, cid: str) -> None:
+        if cid in self._added:
+            del self._added[cid]
+            if self._find(cid) < 0:
+                return
+        elif self._find(cid) < 0 or cid in self._deleted:
+            raise KeyError(cid)
+        self._decoded.pop(cid, None)
+        self._deleted.add(cid)
+
+    def __contains__(self, cid) -> bool:
+        return cid in self._added or (cid not in self._deleted and self._find(cid) >= 0)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self._ids)):
+            cid = self._ids[i].decode("utf-8")
+            if cid not in self._deleted and cid not in self._added:
+                yield cid
+        yield from self._added
+
+    def __len__(self) -> int:
+        stored = len(self._ids) - len(self._deleted)
+        return stored + sum(1 for cid in self._added if self._find(cid) < 0 or cid in self._deleted)
+
+    @property
+    def n_decoded(self) -> int:
+        return len(self._decoded)
+
+    def close(self) -> None:
+        self._index = self._ids = None  # release the buffer exports before unmapping
+        self._mm.close(); self._f.close()
+
+def _header(m: AtlasManifest) -> Dict:
+    return {"version": m.version, "family": m.family, "projections": m.projections, "dag": m.dag,
+            "token_semantics": m.token_semantics, "families": m.families, "lineage": m.lineage, "sign": m.sign}
+
+def write_binary_manifest(m: AtlasManifest, path: str) -> str:
+    """Write m in the indexed binary format (atomic temp-file + rename).
+    Circuits of a lazily loaded manifest that were never decoded are copied as raw records.
+    """
+    header = json.dumps(_header(m), sort_keys=True, ensure_ascii=False, separators=(",",":")).encode("utf-8")
+    ids = sorted(m.circuits, key=lambda c: c.encode("utf-8"))
+    lazy = m.circuits if isinstance(m.circuits, LazyCircuits) else None
+    records: List[bytes] = []
+    for cid in ids:
+        raw = lazy.raw_record(cid) if lazy is not None else None
+        records.append(raw if raw is not None else m.circuits[cid].to_json().encode("utf-8"))
+    id_bytes = [cid.encode("utf-8") for cid in ids]
+    index = np.zeros(len(ids), dtype=INDEX_DTYPE)
+    index["id_len"] = [len(b) for b in id_bytes]
+    index["rec_len"] = [len(r) for r in records]
+    start = len(MAGIC) + 4 + len(header) + 8 + index.nbytes
+    ends = start + np.cumsum(np.concatenate([index["id_len"], index["rec_len"]]).astype(np.uint64))
+    offs = np.concatenate([[start], ends[:-1]]).astype(np.uint64)
+    index["id_off"], index["rec_off"] = offs[:len(ids)], offs[len(ids):]
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC); f.write(struct.pack("<I", len(header))); f.write(header)
+        f.write(struct.pack("<Q", len(ids))); f.write(index.tobytes())
+        for b in id_bytes: f.write(b)
+        for r in records: f.write(r)
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+def read_binary_manifest(path: str) -> AtlasManifest:
+    """Open a binary manifest; circuits decode lazily on access."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a binary atlas manifest: {path}")
+        hlen = struct.unpack("<I", f.read(4))[0]
+        data = json.loads(f.read(hlen).decode("utf-8"))
+    return AtlasManifest(
+        version=data["version"],
+        family=data["family"],
+        projections=data["projections"],
+        circuits=LazyCircuits(path),
+        dag=data["dag"],
+        token_semantics=data.get("token_semantics", {}),
+        families=data.get("families", {}),
+        lineage=data.get("lineage", []),
+        sign=data.get("sign"),
+    )
+
+def json_to_binary(json_path: str, bin_path: str) -> str:
+    from .atlas_store import AtlasStore
+    return write_binary_manifest(AtlasStore(json_path).load(), bin_path)
+
+def binary_to_json(bin_path: str, json_path: str) -> str:
+    from .atlas_store import AtlasStore
+    store = AtlasStore(json_path, fmt="json")
+    store.manifest = read_binary_manifest(bin_path)
+    return store.save()
@@ -0,0 +1,184 @@
+
+from __future__ import annotations
+import glob, hashlib, io, os, threading
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from .spec import atomic_write
+from .blobstore import ShardedBlobStore, parse_ref
+
+# pack-NNNNNN.pack holds raw blob bytes back to back; pack-NNNNNN.idx is the sorted index over them.
+IDX_DTYPE = np.dtype([("hash", "S32"), ("suffix", "S8"), ("offset", "<u8"), ("length", "<u8")])
+
+class _Pack:
+    def __init__(self, path: str, index: np.ndarray):
+        self.path = path
+        self.index = index  # sorted by hash
+
+    def find(self, digest: bytes) -> int:
+        i = int(np.searchsorted(self.index["hash"], digest))
+        # numpy "S" values drop trailing NUL bytes, so compare against the stripped digest
+        return i if i < len(self.index) and self.index["hash"][i] == digest.rstrip(b"\x00") else -1
+
+class PackStore:
+    """Content-addressed blobs appended to large pack files with a sorted hash -> (offset, length) index.
+    Many small blobs cost a handful of inodes, and get_many() coalesces neighbouring records into
+    single reads. put() appends to the active pack; flush() makes it durable and rewrites its index.
+    Bytes appended after the last flush are unindexed (and ignored) if the process dies.
+    Single writer: the lock only guards threads of one process, so two processes (or two
+    PackStores) appending to the same root would interleave writes and overwrite each other's index.
+    """
+    def __init__(self, root: str, max_pack_bytes: int = 256 << 20):
+        self.root = root
+        self.max_pack_bytes = max_pack_bytes
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self.packs: List[_Pack] = []
+        for idx_path in sorted(glob.glob(os.path.join(root, "pack-*.idx"))):
+            index = np.fromfile(idx_path, dtype=IDX_DTYPE)
+            self.packs.append(_Pack(idx_path[:-4] + ".pack", index))
+        self._active: Optional[_Pack] = None
+        self._pending: Dict[bytes, Tuple[bytes, int, int]] = {}  # digest -> (suffix, offset, length)
+        self._af = None
+        self.last_read_count = 0  # preads issued by the last get_many
+        if self.packs:
+            last = self.packs[-1]
+            # Keep appending to the newest pack until it is full; drop any unindexed tail
+            if os.path.getsize(last.path) < max_pack_bytes:
+                self._active = self.packs.pop()
+                end = int((last.index["offset"] + last.index["length"]).max()) if len(last.index) else 0
+                with open(last.path, "r+b") as f:
+                    f.truncate(end)
+
+    # --- writing ---------------------------------------------------------------
+    def _open_active(self) -> None:
+        if self._active is None:
+            n = len(self.packs)
+            self._active = _Pack(os.path.join(self.root, f"pack-{n:06d}.pack"), np.zeros(0, dtype=IDX_DTYPE))
+        if self._af is None:
+            self._af = open(self._active.path, "ab")
+
+    def _lookup(self, digest: bytes) -> Optional[Tuple[str, int, int]]:
+        if digest in self._pending:
+            _, off, ln = self._pending[digest]
+            return self._active.path, off, ln
+        for p in ([self._active] if self._active is not None else []) + self.packs[::-1]:
+            i = p.find(digest)
+            if i >= 0:
+                e = p.index[i]
+                return p.path, int(e["offset"]), int(e["length"])
+        return None
+
+    def put(self, data: bytes, suffix: str = ".bin") -> str:
+        sfx = suffix.encode("ascii")
+        if len(sfx) > IDX_DTYPE["suffix"].itemsize:
+            raise ValueError(f"suffix {suffix!r} longer than {IDX_DTYPE['suffix'].itemsize} bytes")
+        h = hashlib.sha256(data).hexdigest()
+        digest = bytes.fromhex(h)
+        with self._lock:
+            if self._lookup(digest) is None:
+                self._open_active()
+                off = self._af.tell()
+                self._af.write(data)
+                self._pending[digest] = (sfx, off, len(data))
+                if off + len(data) >= self.max_pack_bytes:
+                    self._flush_locked(seal=True)
+        return f"sha256:{h}{suffix}"
+
+    def _flush_locked(self, seal: bool = False) -> None:
+        if self._af is not None:
+            self._af.flush(); os.fsync(self._af.fileno())
+        if self._pending:
+            new = np.array([(d, s, o, l) for d, (s, o, l) in self._pending.items()], dtype=IDX_DTYPE)
+            index = np.concatenate([self._active.index, new])
+            index = index[np.argsort(index["hash"], kind="stable")]
+            atomic_write(self._active.path[:-5] + ".idx", [index.tobytes()])
+            self._active.index = index
+            self._pending = {}
+        if seal and self._active is not None:
+            if self._af is not None:
+                self._af.close(); self._af = None
+            self.packs.append(self._active)
+            self._active = None
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            if self._af is not None:
+                self._af.close(); self._af = None
+
+    # --- reading ---------------------------------------------------------------
+    def exists(self, ref: str) -> bool:
+        return self._lookup(bytes.fromhex(parse_ref(ref)[0])) is not None
+
+    def get(self, ref: str) -> bytes:
+        return self.get_many([ref])[ref]
+
+    def get_many(self, refs: List[str], max_gap: int = 64 << 10) -> Dict[str, bytes]:
+        """Fetch many blobs, reading each pack in offset order and merging records that are at
+        most max_gap bytes apart into one pread."""
+        with self._lock:
+            if self._af is not None:
+                self._af.flush()
+            by_pack: Dict[str, List[Tuple[int, int, str]]] = {}
+            for ref in dict.fromkeys(refs):
+                loc = self._lookup(bytes.fromhex(parse_ref(ref)[0]))
+                if loc is None:
+                    raise FileNotFoundError(ref)
+                by_pack.setdefault(loc[0], []).append((loc[1], loc[2], ref))
+        out: Dict[str, bytes] = {}
+        self.last_read_count = 0
+        for path, items in by_pack.items():
+            items.sort()
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                i = 0
+                while i < len(items):
+                    start, end, j = items[i][0], items[i][0] + items[i][1], i + 1
+                    while j < len(items) and items[j][0] - end <= max_gap:
+                        end = max(end, items[j][0] + items[j][1]); j += 1
+                    buf = os.pread(fd, end - start, start)
+                    self.last_read_count += 1
+                    for off, ln, ref in items[i:j]:
+                        out[ref] = buf[off - start:off - start + ln]
+                    i = j
+            finally:
+                os.close(fd)
+        return out
+
+    def load_arrays(self, refs: List[str]) -> Dict[str, np.ndarray]:
+        return {ref: np.load(io.BytesIO(b), allow_pickle=False) for ref, b in self.get_many(refs).items()}
+
+    def iter_refs(self) -> Iterator[str]:
+        with self._lock:
+            packs = self.packs + ([self._active] if self._active is not None else [])
+            entries = [(e["hash"], e["suffix"]) for p in packs for e in p.index]
+            entries += [(d, s) for d, (s, _, _) in self._pending.items()]
+        for digest, suffix in entries:
+            h = bytes(digest).ljust(32, b"\x00").hex()
+            yield f"sha256:{h}{suffix.decode('ascii')}"
+
+def repack(blob_dir: str, packs: PackStore, delete_loose: bool = False) -> Dict[str, int]:
+    """Move every loose blob under blob_dir (flat or sharded) into packs.
+    Blobs whose content does not match their name are left in place and counted as corrupt.
+    """
+    rep = {"packed": 0, "corrupt": 0, "bytes": 0}
+    moved: List[str] = []
+    for ref, path in ShardedBlobStore(blob_dir).iter_refs():
+        with open(path, "rb") as f:
+            data = f.read()
+        h, suffix = parse_ref(ref)
+        if hashlib.sha256(data).hexdigest() != h:
+            rep["corrupt"] += 1
+            continue
+        packs.put(data, suffix)
+        rep["packed"] += 1; rep["bytes"] += len(data)
+        moved.append(path)
+    packs.flush()
+    if delete_loose:
+        for p in moved:
+            os.remove(p)
+    return rep
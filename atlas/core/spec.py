@@ -1,27 +1,47 @@
 
 from __future__ import annotations
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field, asdict, replace
 from typing import Dict, List, Literal, Optional, Tuple, Any
-import json, hashlib, os, time, base64, hmac, pathlib
+import json, hashlib, os, time, base64, hmac, pathlib, tempfile
 
 BLOB_DIR = os.environ.get("ATLAS_BLOB_DIR", "/mnt/data/universal_atlas/blobs")
 
 def sha256_bytes(b: bytes) -> str:
     return hashlib.sha256(b).hexdigest()
 
+def atomic_write(path: str, chunks) -> None:
+    """Write chunks to a temp file next to path, fsync, then rename over path."""
+    d = os.path.dirname(path)
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=d, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for c in chunks:
+                f.write(c)
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
 def content_address_store(data: bytes, suffix: str = ".bin") -> str:
     h = sha256_bytes(data)
     p = os.path.join(BLOB_DIR, f"{h}{suffix}")
-    os.makedirs(BLOB_DIR, exist_ok=True)
-    if not os.path.exists(p):
-        with open(p, "wb") as f:
-            f.write(data)
+    try:
+        os.utime(p)  # dedup hit: keep the blob clear of the GC grace period like a fresh write
+    except FileNotFoundError:
+        atomic_write(p, [data])
     return f"sha256:{h}{suffix}"
 
 def content_address_load(ref: str) -> bytes:
+    """Read a blob from BLOB_DIR, flat (as written above) or hash-sharded (as ShardedBlobStore writes it)."""
     assert ref.startswith("sha256:"), "Unsupported ref"
     fname = ref.split("sha256:")[1]
     p = os.path.join(BLOB_DIR, fname)
+    if not os.path.exists(p):
+        from .blobstore import ShardedBlobStore  # blobstore imports this module
+        p = ShardedBlobStore(BLOB_DIR).locate(ref) or p
     with open(p, "rb") as f:
         return f.read()
 
@@ -61,7 +81,7 @@ class AtlasManifest:
     sign: Optional[str] = None
 
     def to_json(self) -> str:
-        d = asdict(self)
+        d = asdict(replace(self, circuits={}))  # circuits may be a lazy mapping; serialize them one by one
         # circuits need to be serializable
         d["circuits"] = {k: json.loads(v.to_json()) for k,v in self.circuits.items()}
         return json.dumps(d, sort_keys=True, ensure_ascii=False, separators=(",",":"))
@@ -69,6 +89,16 @@ class AtlasManifest:
     def sign_with_key(self, key: bytes) -> None:
         self.sign = sign_hmac(self.to_json().encode("utf-8"), key)
 
+    def version_of(self, part: str) -> int:
+        """Mutation counter of part ("circuits" or "dag"); cached indexes compare against it."""
+        return self.__dict__.get("_versions", {}).get(part, 0)
+
+    def bump_version(self, part: str) -> int:
+        """Record a mutation of part. Writers other than AtlasStore call this after editing in place."""
+        v = self.__dict__.setdefault("_versions", {})
+        v[part] = v.get(part, 0) + 1
+        return v[part]
+
 @dataclass
 class Plan:
     circuits: List[str]
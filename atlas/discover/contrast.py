@@ -1,53 +1,167 @@
 
 import numpy as np
-from typing import List, Tuple, Dict
+from functools import lru_cache
+from typing import Iterable, List, Tuple, Dict, Union
 from ..semantics.encoder import ByteNGramEncoder
+from ..utils.utils import RunningCovariance, RunningMoments
+from .sources import iter_chunks
+
+PUNCT = np.array([ord(c) for c in ',.;:!?-'], dtype=np.uint32)
+
+@lru_cache(maxsize=16)
+def projection(dim: int, k: int = 16, seed: int = 1234) -> np.ndarray:
+    """Fixed random projection used to reduce embeddings to k dims (read-only, built once per dim)."""
+    rng = np.random.RandomState(seed)
+    P = rng.normal(size=(dim, k)).astype(np.float32) / np.sqrt(dim)
+    P.setflags(write=False)
+    return P
+
+def text_stats(texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-text character length and punctuation ratio, counted over one UTF-32 buffer of all texts."""
+    lens = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    codes = np.frombuffer("".join(texts).encode("utf-32-le", errors="surrogatepass"), dtype=np.uint32)
+    csum = np.concatenate([[0], np.cumsum(np.isin(codes, PUNCT), dtype=np.int64)])
+    ends = np.cumsum(lens)
+    punct = csum[ends] - csum[ends - lens]
+    return lens.astype(np.float32), (punct / np.maximum(1, lens)).astype(np.float32)
+
+def raw_confounders(texts: List[str], encoder: ByteNGramEncoder) -> np.ndarray:
+    """Unstandardized confounders: length, punctuation ratio, 16-dim projection of the embedding."""
+    lens, punct = text_stats(texts)
+    proj = encoder.encode_batch(texts) @ projection(encoder.dim)
+    return np.concatenate([lens[:, None], punct[:, None], proj], axis=1)
 
 def confounder_features(texts: List[str], encoder: ByteNGramEncoder) -> np.ndarray:
     # Simple confounders: length, punctuation ratio, semantic embedding (low-dim proj)
-    lens = np.array([len(t) for t in texts], dtype=np.float32)[:,None]
-    punct = np.array([sum(ch in ',.;:!?-' for ch in t)/max(1,len(t)) for t in texts], dtype=np.float32)[:,None]
-    emb = np.stack([encoder.encode(t) for t in texts], axis=0).astype(np.float32)
-    # reduce embedding by random projection to 16 dims for stability
-    rng = np.random.RandomState(1234)
-    P = rng.normal(size=(emb.shape[1], 16)).astype(np.float32) / np.sqrt(emb.shape[1])
-    proj = emb @ P
-    X = np.concatenate([lens, punct, proj], axis=1)
+    X = raw_confounders(texts, encoder)
     # standardize
     X = (X - X.mean(0, keepdims=True)) / (X.std(0, keepdims=True) + 1e-6)
     return X
 
 def balance_weights(pos_texts: List[str], neg_texts: List[str], encoder: ByteNGramEncoder, l2: float = 1.0) -> Tuple[np.ndarray, np.ndarray]:
     """Compute nonnegative importance weights to match confounder moments.
-    We solve a ridge-regularized least squares to make the (weighted) pos mean match neg mean.
+    Both sides are standardized with the positives' mean and std, so A (standardized pos features) is centered
+    and mu_n is the neg mean in the same units. The ridge problem min_w ||A^T w - n_p mu_n||^2 + l2||w - 1||^2
+    then has the solution w = 1 + A (A^T A + l2 I)^{-1} n_p mu_n (since A^T 1 = 0).
     """
-    Xp = confounder_features(pos_texts, encoder)   # n_p x d
-    Xn = confounder_features(neg_texts, encoder)   # n_n x d
-    mu_n = Xn.mean(0)                               # d
-    # Solve min_w ||Xp^T w / sum(w) - mu_n||^2 + l2||w-1||^2, w>=0
-    # Approximate by ignoring normalization in denominator first, then renormalize.
-    A = Xp
-    b = mu_n * len(pos_texts)
-    AtA = A.T @ A + l2 * np.eye(A.shape[1], dtype=np.float32)
-    w_lin = A @ np.linalg.solve(AtA, b)
-    w = np.maximum(w_lin, 1e-3).astype(np.float32)
+    Rp = raw_confounders(pos_texts, encoder).astype(np.float64)   # n_p x d
+    Rn = raw_confounders(neg_texts, encoder).astype(np.float64)   # n_n x d
+    m, sd = Rp.mean(0), Rp.std(0) + 1e-6
+    A = (Rp - m) / sd
+    mu_n = ((Rn - m) / sd).mean(0)                                # d
+    beta = np.linalg.solve(A.T @ A + l2 * np.eye(A.shape[1]), mu_n * len(pos_texts))
+    w = np.maximum(1.0 + A @ beta, 1e-3).astype(np.float32)
     # Normalize to have mean weight ~ 1
     w *= len(pos_texts) / (w.sum() + 1e-8)
     # For negatives, set uniform weights
     w_neg = np.ones(len(neg_texts), dtype=np.float32)
     return w, w_neg
 
-def mmd2(Xw: np.ndarray, Yw: np.ndarray, sigma: float = 1.0) -> float:
+def confounder_moments(texts: Union[Iterable[str], str], encoder: ByteNGramEncoder, chunk_size: int = 1024,
+                       cov: bool = True) -> RunningMoments:
+    """One pass over texts (iterable or text/JSONL path) accumulating raw confounder mean and, with cov,
+    co-moments (a RunningCovariance)."""
+    dim = 2 + projection(encoder.dim).shape[1]
+    acc = RunningCovariance(dim) if cov else RunningMoments(dim)
+    for chunk in iter_chunks(texts, chunk_size):
+        acc.update(raw_confounders(chunk, encoder))
+    return acc
+
+def balance_weights_stream(pos_texts: Union[Iterable[str], str], neg_texts: Union[Iterable[str], str], encoder: ByteNGramEncoder,
+                           l2: float = 1.0, chunk_size: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+    """balance_weights over chunked corpora without holding their features.
+    With m, s the positives' mean and std and C their co-moment matrix, A^T A = diag(1/s) C diag(1/s), and the
+    right-hand side only needs the neg mean; both come from one chunked pass per side. The ridge system is
+    solved once, then the weights are read off a second pass over the positives (pos_texts must be re-iterable).
+    """
+    mp = confounder_moments(pos_texts, encoder, chunk_size)
+    mn = confounder_moments(neg_texts, encoder, chunk_size, cov=False)
+    sd = np.sqrt(mp.var()) + 1e-6
+    AtA = mp.C / np.outer(sd, sd) + l2 * np.eye(mp.C.shape[0])
+    beta = np.linalg.solve(AtA, (mn.mean - mp.mean) / sd * mp.n)
+    w = np.concatenate([np.zeros(0)] + [1.0 + ((raw_confounders(chunk, encoder) - mp.mean) / sd) @ beta
+                                        for chunk in iter_chunks(pos_texts, chunk_size)])
+    w = np.maximum(w, 1e-3).astype(np.float32)
+    w *= mp.n / (w.sum() + 1e-8)
+    return w, np.ones(mn.n, dtype=np.float32)
+
+def _rbf(a: np.ndarray, b: np.ndarray, sigma: float) -> np.ndarray:
+    aa = (a*a).sum(1, keepdims=True)
+    bb = (b*b).sum(1, keepdims=True).T
+    D = aa + bb - 2*a@b.T
+    return np.exp(-D/(2*sigma**2))
+
+def _kernel_dot(A: np.ndarray, B: np.ndarray, S: np.ndarray, sigma: float, block: int) -> np.ndarray:
+    """K(A, B) @ S computed over block x block kernel tiles (S: len(B) x m)."""
+    out = np.zeros((A.shape[0], S.shape[1]), dtype=np.float64)
+    for i in range(0, A.shape[0], block):
+        for j in range(0, B.shape[0], block):
+            out[i:i+block] += _rbf(A[i:i+block], B[j:j+block], sigma) @ S[j:j+block]
+    return out
+
+def mmd2(Xw: np.ndarray, Yw: np.ndarray, sigma: float = 1.0, method: str = "exact", block: int = 2048,
+         n_features: int = 1024, seed: int = 0) -> float:
     """Squared Maximum Mean Discrepancy with RBF kernel, using weights as sample weights.
     Xw, Yw: tuples (X, w) where X is nxd, w is n
+    method: "exact" streams over block x block kernel tiles (memory O(block^2));
+            "rff" uses n_features random Fourier features (time and memory linear in n).
     """
     X, wx = Xw; Y, wy = Yw
-    def k(a,b):
-        aa = (a*a).sum(1, keepdims=True)
-        bb = (b*b).sum(1, keepdims=True).T
-        D = aa + bb - 2*a@b.T
-        return np.exp(-D/(2*sigma**2))
-    Kxx = k(X,X); Kyy = k(Y,Y); Kxy = k(X,Y)
     wxn = wx/(wx.sum()+1e-8); wyn = wy/(wy.sum()+1e-8)
-    mmd = (wxn[:,None]*wxn[None,:]*Kxx).sum() + (wyn[:,None]*wyn[None,:]*Kyy).sum() - 2*(wxn[:,None]*wyn[None,:]*Kxy).sum()
-    return float(mmd)
+    if method == "rff":
+        F = rff_map(X.shape[1], sigma, n_features, seed)
+        return float(np.sum((F(X).T @ wxn - F(Y).T @ wyn)**2))
+    assert method == "exact", f"Unknown mmd2 method: {method}"
+    # Signed weights s = [wxn, -wyn] give mmd2 = s^T K([X;Y]) s
+    Z = np.concatenate([X, Y]); s = np.concatenate([wxn, -wyn]).astype(np.float64)[:, None]
+    return float(s[:, 0] @ _kernel_dot(Z, Z, s, sigma, block)[:, 0])
+
+class _RFF:
+    def __init__(self, W: np.ndarray, b: np.ndarray):
+        self.W, self.b = W, b
+    def __call__(self, X: np.ndarray) -> np.ndarray:
+        return np.sqrt(2.0 / self.W.shape[1]) * np.cos(X @ self.W + self.b)
+
+@lru_cache(maxsize=16)
+def rff_map(dim: int, sigma: float, n_features: int = 1024, seed: int = 0) -> _RFF:
+    """Random Fourier feature map phi with phi(x).phi(y) ~ exp(-||x-y||^2 / (2 sigma^2)), fixed per arguments."""
+    rng = np.random.RandomState(seed)
+    W = rng.normal(scale=1.0 / sigma, size=(dim, n_features))
+    b = rng.uniform(0.0, 2 * np.pi, size=n_features)
+    W.setflags(write=False); b.setflags(write=False)
+    return _RFF(W, b)
+
+def mmd_permutation_test(Xw: np.ndarray, Yw: np.ndarray, sigma: float = 1.0, n_perm: int = 200, method: str = "rff",
+                         n_features: int = 1024, block: int = 2048, batch: int = 64, seed: int = 0) -> Dict[str, float]:
+    """Weighted mmd2 with a permutation p-value. Samples keep their weights when labels are shuffled.
+    Every batch of permutations is scored with matrix products: for signed weights S (one column per
+    permutation) the statistics are ||Phi^T S||^2 (rff, Phi computed once) or diag(S^T K S) (exact).
+    Exact mode keeps K when N <= block (the same O(block^2) memory budget as mmd2); otherwise its tiles
+    are recomputed for every batch, so larger batches amortize them.
+    """
+    X, wx = Xw; Y, wy = Yw
+    Z = np.concatenate([X, Y]); w = np.concatenate([wx, wy]).astype(np.float64)
+    nx, N = X.shape[0], Z.shape[0]
+    if method == "rff":
+        Phi = rff_map(Z.shape[1], sigma, n_features, seed)(Z)
+        stat = lambda S: np.sum((Phi.T @ S)**2, axis=0)
+    else:
+        assert method == "exact", f"Unknown mmd2 method: {method}"
+        if N <= block:
+            K = _rbf(Z, Z, sigma)
+            stat = lambda S: np.sum(S * (K @ S), axis=0)
+        else:
+            stat = lambda S: np.sum(S * _kernel_dot(Z, Z, S, sigma, block), axis=0)
+    def signed(labels: np.ndarray) -> np.ndarray:  # labels: N x m booleans, True = X side
+        wx_ = np.where(labels, w[:, None], 0.0); wy_ = np.where(labels, 0.0, w[:, None])
+        return wx_ / (wx_.sum(0) + 1e-8) - wy_ / (wy_.sum(0) + 1e-8)
+    obs = float(stat(signed((np.arange(N) < nx)[:, None]))[0])
+    rng = np.random.RandomState(seed)
+    null = []
+    for start in range(0, n_perm, batch):
+        m = min(batch, n_perm - start)
+        labels = np.argsort(rng.rand(N, m), axis=0) < nx
+        null.append(stat(signed(labels)))
+    null = np.concatenate(null) if null else np.zeros(0)
+    p = (1.0 + float(np.sum(null >= obs))) / (1.0 + len(null))
+    return {"mmd2": obs, "p_value": p, "n_perm": len(null)}
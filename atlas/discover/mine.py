@@ -1,9 +1,11 @@
 
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import Iterable, List, Dict, Tuple, Union
 from .contrast import balance_weights, confounder_features, mmd2
 from .min_pairs import minimal_pairs
+from .sources import iter_chunks
 from ..models.mock import MockBehaviorModel
+from ..utils.utils import RunningMoments
 
 def collect_activations(model: MockBehaviorModel, texts: List[str]) -> Dict[str, np.ndarray]:
     out = model.forward(texts)
@@ -18,35 +20,90 @@ def differential_salience(model: MockBehaviorModel, behavior: str, pos: List[str
     sal = dH * np.abs(grad)                                   # elementwise
     return {"H1": sal}
 
-def iterative_prune_preserve(model: MockBehaviorModel, behavior: str, pos: List[str], neg: List[str], sal_H1: np.ndarray, keep_frac: float = 0.1) -> np.ndarray:
-    """Return mask over H1 units that preserves behavior delta while as sparse as possible."""
+def differential_salience_stream(model: MockBehaviorModel, behavior: str, pos: Union[Iterable[str], str], neg: Union[Iterable[str], str], chunk_size: int = 1024) -> Dict[str, np.ndarray]:
+    """differential_salience over iterables or text/JSONL paths, forwarding chunk_size prompts at a time.
+    H1 means and variances are accumulated with RunningMoments, so memory does not grow with the corpus.
+    Besides "H1" returns per-unit H1 variances of each side and "H1_se", the standard error of the mean difference.
+    """
+    d = model.W1.shape[1]
+    mom = {"pos": RunningMoments(d), "neg": RunningMoments(d)}
+    grad_sum, n = np.zeros(d, dtype=np.float64), 0
+    for side, src in (("pos", pos), ("neg", neg)):
+        for chunk in iter_chunks(src, chunk_size):
+            mom[side].update(model.forward(chunk)["H1"])
+            grad_sum += model.grad_wrt_H1(chunk, behavior).sum(0, dtype=np.float64)
+            n += len(chunk)
+    p, q = mom["pos"], mom["neg"]
+    assert p.n > 0 and q.n > 0, "pos and neg must be non-empty"
+    dH = p.mean - q.mean
+    sal = (dH * np.abs(grad_sum / n)).astype(np.float32)
+    se = np.sqrt(p.var(ddof=1) / p.n + q.var(ddof=1) / q.n)
+    return {"H1": sal, "H1_var_pos": p.var(), "H1_var_neg": q.var(), "H1_se": se, "n_pos": p.n, "n_neg": q.n}
+
+class PruneEngine:
+    """Cached per-unit contributions of H1 to the behavior delta (mean pos score - mean neg score).
+    The head is linear, so the delta of any kept-unit mask is the sum of its units' contributions;
+    every pruning schedule below runs on these without further forward passes.
+    """
+    def __init__(self, model: MockBehaviorModel, behavior: str, pos: List[str], neg: List[str]):
+        idx = {"hedging":0,"formality":1,"refusal":2}[behavior]
+        dH = model.forward(pos)["H1"].mean(0).astype(np.float64) - model.forward(neg)["H1"].mean(0)
+        self.contrib = dH * model.W2[:, idx]  # d_hidden
+        self.n = self.contrib.shape[0]
+
+    def delta(self, mask: np.ndarray) -> float:
+        return float(self.contrib[mask].sum())
+
+    def prefix_deltas(self, order: np.ndarray) -> np.ndarray:
+        """prefix_deltas(order)[i] = delta of keeping order[:i+1]."""
+        return np.cumsum(self.contrib[order])
+
+    def _mask(self, units: np.ndarray) -> np.ndarray:
+        mask = np.zeros(self.n, dtype=bool); mask[units] = True
+        return mask
+
+    def grow(self, order: np.ndarray, k: int, frac: float = 0.8) -> np.ndarray:
+        """Extend the top-k prefix one unit at a time while the delta stays within frac of the top-k delta."""
+        pre = self.prefix_deltas(order)
+        fails = np.flatnonzero(pre[k:] < frac * pre[k-1])
+        size = k + int(fails[0]) if fails.size else self.n
+        return self._mask(order[:size])
+
+    def bisect(self, order: np.ndarray, frac: float = 0.8) -> np.ndarray:
+        """Binary search for the shortest prefix reaching frac of the full delta (assumes it is monotone)."""
+        pre = self.prefix_deltas(order)
+        goal = frac * pre[-1]
+        lo, hi = 1, self.n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if pre[mid-1] >= goal: hi = mid
+            else: lo = mid + 1
+        return self._mask(order[:lo])
+
+    def backward(self, frac: float = 0.8) -> np.ndarray:
+        """Greedy backward elimination: repeatedly drop the unit whose removal hurts the delta least."""
+        total = self.contrib.sum()
+        order = np.argsort(self.contrib, kind="stable")  # least useful first
+        remaining = total - np.cumsum(self.contrib[order])
+        fails = np.flatnonzero(remaining < frac * total)
+        n_drop = min(int(fails[0]) if fails.size else self.n, self.n - 1)
+        return self._mask(order[n_drop:])
+
+def iterative_prune_preserve(model: MockBehaviorModel, behavior: str, pos: List[str], neg: List[str], sal_H1: np.ndarray, keep_frac: float = 0.1, schedule: str = "grow", engine: PruneEngine = None) -> np.ndarray:
+    """Return mask over H1 units that preserves behavior delta while as sparse as possible.
+    schedule: "grow" (extend the salience-ordered top-k while within 80% of its delta), "bisect" or "backward".
+    """
+    engine = engine or PruneEngine(model, behavior, pos, neg)
     n = sal_H1.shape[0]
     order = np.argsort(-np.abs(sal_H1))  # descending
     k = max(1, int(keep_frac * n))
-    keep = set(order[:k])
-    def behavior_delta(mask):
-        # Zero out non-kept units and measure delta in behavior score between pos and neg
-        def score(texts):
-            out = model.forward(texts)
-            H1 = out["H1"].copy()
-            nz = np.ones(H1.shape[1], dtype=bool)
-            nz[list(set(range(n)) - set(mask))] = False
-            H1[:, ~nz] = 0.0
-            Z2 = H1 @ model.W2 + model.b2
-            idx = {"hedging":0,"formality":1,"refusal":2}[behavior]
-            sc = Z2[:, idx]
-            return float(sc.mean())
-        return score(pos) - score(neg)
-    target = behavior_delta(keep)
-    # Try to drop lowest contributors while keeping within 80% of target
-    for i in range(k, n):
-        cand = set(order[:i+1])
-        if behavior_delta(cand) >= 0.8 * target:
-            keep = cand
-        else:
-            break
-    mask = np.zeros(n, dtype=bool); mask[list(keep)] = True
-    return mask
+    if schedule == "grow":
+        return engine.grow(order, k)
+    if schedule == "bisect":
+        return engine.bisect(order)
+    if schedule == "backward":
+        return engine.backward()
+    raise ValueError(f"Unknown pruning schedule: {schedule}")
 
 def activation_patching_verify(model: MockBehaviorModel, behavior: str, pos: List[str], neg: List[str], mask: np.ndarray) -> Dict[str, float]:
     # Patch H1 activations from pos into neg on masked units and measure flip
@@ -62,20 +119,20 @@ def activation_patching_verify(model: MockBehaviorModel, behavior: str, pos: Lis
     patched_neg = float(z2_patch[idx])
     return {"base_pos":base_pos, "base_neg":base_neg, "patched_neg":patched_neg, "delta": patched_neg - base_neg}
 
-def isolation_score(model: MockBehaviorModel, behavior: str, mask: np.ndarray, n_pairs: int = 32) -> float:
+def isolation_scores(model: MockBehaviorModel, behavior: str, masks: np.ndarray, n_pairs: int = 32) -> np.ndarray:
+    """Isolation score for a stack of masks (M x d_hidden, bool) in one forward pass and one matmul.
+    Score = fraction of minimal pairs (a, b) whose masked behavior score ranks a above b.
+    """
+    masks = np.atleast_2d(np.asarray(masks, dtype=bool))
     pairs = minimal_pairs(behavior, n_pairs)
     idx = {"hedging":0,"formality":1,"refusal":2}[behavior]
-    hits, total = 0, 0
-    for a,b in pairs:
-        out_a = model.forward([a])["H1"]; out_b = model.forward([b])["H1"]
-        # With only masked units, compute behavior score
-        def sc(H1):
-            H = H1.copy()
-            nz = np.zeros(H.shape[1], dtype=bool); nz[mask] = True
-            H[:, ~nz] = 0.0
-            z2 = H @ model.W2 + model.b2
-            return float(z2[:,idx].mean())
-        if sc(out_a) > sc(out_b):
-            hits += 1
-        total += 1
-    return hits/float(total)
+    H1 = model.forward([a for a, _ in pairs] + [b for _, b in pairs])["H1"]
+    # Masked head: column m is W2[:, idx] restricted to mask m
+    S = H1 @ (masks.T * model.W2[:, idx][:, None]) + model.b2[idx]  # 2P x M
+    P = len(pairs)
+    return (S[:P] > S[P:]).mean(0)
+
+def isolation_score(model: MockBehaviorModel, behavior: str, mask: np.ndarray, n_pairs: int = 32) -> float:
+    if mask.dtype != bool:
+        idx = mask; mask = np.zeros(model.W2.shape[0], dtype=bool); mask[idx] = True
+    return float(isolation_scores(model, behavior, mask[None, :], n_pairs)[0])
@@ -0,0 +1,103 @@
+
+from __future__ import annotations
+import os, time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
+from ..semantics.encoder import ByteNGramEncoder
+from ..models.mock import MockBehaviorModel
+from ..core.atlas_store import AtlasStore
+from ..core.hierarchy import add_level_tag
+from .mine import differential_salience, iterative_prune_preserve
+from .to_circuit import mask_to_circuit
+from .sources import iter_texts
+
+WEIGHT_NAMES = ("W1", "b1", "W2", "b2")
+
+@dataclass
+class BehaviorJob:
+    """One discovery task. pos/neg are lists of texts or paths to .txt (one per line) or .jsonl files."""
+    behavior: str
+    pos: Union[List[str], str]
+    neg: Union[List[str], str]
+    behavior_axis: str = "intensity"
+    circuit_id: Optional[str] = None  # defaults to behavior/<behavior>@v1
+    layer: int = 1
+    keep_frac: float = 0.2
+    level: Optional[str] = "behavioral"
+    timing: Dict[str, float] = field(default_factory=dict)
+
+    def cid(self) -> str:
+        return self.circuit_id or f"behavior/{self.behavior}@v1"
+
+def _discover(model: MockBehaviorModel, job: BehaviorJob) -> Tuple[np.ndarray, Dict[str, float]]:
+    t0 = time.perf_counter()
+    pos, neg = list(iter_texts(job.pos)), list(iter_texts(job.neg))
+    t1 = time.perf_counter()
+    sal = differential_salience(model, job.behavior, pos, neg)["H1"]
+    t2 = time.perf_counter()
+    mask = iterative_prune_preserve(model, job.behavior, pos, neg, sal, keep_frac=job.keep_frac)
+    t3 = time.perf_counter()
+    return mask, {"load_s": t1 - t0, "salience_s": t2 - t1, "prune_s": t3 - t2, "total_s": t3 - t0, "pid": os.getpid()}
+
+# --- shared-memory weights ---------------------------------------------------
+def _publish(model: MockBehaviorModel) -> Tuple[shared_memory.SharedMemory, List[Tuple[str, int, Tuple[int, ...], str]]]:
+    """Copy the weights into one shared-memory segment; returns it and the (name, offset, shape, dtype) layout."""
+    layout, off = [], 0
+    for name in WEIGHT_NAMES:
+        a = getattr(model, name)
+        off = (off + 63) // 64 * 64
+        layout.append((name, off, a.shape, a.dtype.str))
+        off += a.nbytes
+    shm = shared_memory.SharedMemory(create=True, size=max(off, 1))
+    for (name, o, shape, dt) in layout:
+        np.ndarray(shape, dtype=dt, buffer=shm.buf, offset=o)[...] = getattr(model, name)
+    return shm, layout
+
+_WORKER: Dict[str, Any] = {}
+
+def _init_worker(shm_name: str, layout, enc_config: Tuple[int, int, int], sparse_input: bool) -> None:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    arrays = {}
+    for (name, o, shape, dt) in layout:
+        a = np.ndarray(shape, dtype=dt, buffer=shm.buf, offset=o)
+        a.flags.writeable = False
+        arrays[name] = a
+    n, dim, seed = enc_config
+    _WORKER["shm"] = shm  # keep the mapping alive for the life of the worker
+    _WORKER["model"] = MockBehaviorModel.from_weights(ByteNGramEncoder(n=n, dim=dim, seed=seed), sparse_input=sparse_input, **arrays)
+
+def _run_job(job: BehaviorJob) -> Tuple[np.ndarray, Dict[str, float]]:
+    return _discover(_WORKER["model"], job)
+
+def run_discovery(model: MockBehaviorModel, jobs: List[BehaviorJob], store: AtlasStore, max_workers: Optional[int] = None, mp_context=None) -> Dict[str, Any]:
+    """Discover one circuit per job and add it to store (store.save() is left to the caller).
+    Jobs run over a process pool that maps the model weights from a single shared-memory segment;
+    max_workers=0 runs them serially in-process. Returns wall time and per-job timings keyed by circuit id.
+    """
+    t0 = time.perf_counter()
+    results: List[Tuple[np.ndarray, Dict[str, float]]] = []
+    if max_workers == 0 or len(jobs) <= 1:
+        results = [_discover(model, job) for job in jobs]
+        workers = 0
+    else:
+        workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+        shm, layout = _publish(model)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker,
+                                     initargs=(shm.name, layout, model.encoder.config, model.sparse_input)) as ex:
+                results = list(ex.map(_run_job, jobs))
+        finally:
+            shm.close(); shm.unlink()
+    report = {"workers": workers, "jobs": {}}
+    for job, (mask, timing) in zip(jobs, results):
+        c = mask_to_circuit(job.cid(), layer=job.layer, rows_mask=mask, behavior_axis=job.behavior_axis)
+        if job.level:
+            c = add_level_tag(c, job.level)
+        store.add_circuit(c)
+        job.timing = timing
+        report["jobs"][job.cid()] = dict(timing, rows=int(mask.sum()))
+    report["wall_s"] = time.perf_counter() - t0
+    return report
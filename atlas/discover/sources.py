@@ -0,0 +1,31 @@
+
+import json
+from typing import Iterable, Iterator, List, Union
+
+def iter_texts(src: Union[Iterable[str], str]) -> Iterator[str]:
+    """Texts from an iterable, a plain-text file (one per line) or a JSONL file (strings or {"text": ...})."""
+    if not isinstance(src, str):
+        yield from src
+        return
+    with open(src, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            if src.endswith(".jsonl"):
+                rec = json.loads(line)
+                yield rec["text"] if isinstance(rec, dict) else str(rec)
+            else:
+                yield line
+
+def iter_chunks(src: Union[Iterable[str], str], size: int) -> Iterator[List[str]]:
+    """Consecutive lists of at most size texts from iter_texts(src)."""
+    assert size > 0
+    chunk: List[str] = []
+    for t in iter_texts(src):
+        chunk.append(t)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
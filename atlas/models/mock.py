@@ -1,14 +1,56 @@
 
 import numpy as np
 from typing import Dict, List, Tuple
-from ..semantics.encoder import ByteNGramEncoder
+from ..semantics.encoder import ByteNGramEncoder, CSRCounts
+
+class LazyActivations(dict):
+    """Activation dict whose "X" entry is densified from the sparse input only when first read."""
+    def __init__(self, csr: CSRCounts, signs: np.ndarray, **acts):
+        super().__init__(**acts)
+        self.csr = csr
+        self._signs = signs
+
+    def __missing__(self, key):
+        if key != "X":
+            raise KeyError(key)
+        X = self.csr.toarray(signs=self._signs)
+        self["X"] = X
+        return X
+
+    def __contains__(self, key):
+        return key == "X" or super().__contains__(key)
+
+    def __len__(self):
+        return super().__len__() + (not super().__contains__("X"))
+
+    def __iter__(self):
+        if not super().__contains__("X"):
+            yield "X"
+        yield from super().__iter__()
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    # Whole-mapping views densify X so they agree with indexing
+    def keys(self):
+        self["X"]
+        return super().keys()
+
+    def items(self):
+        self["X"]
+        return super().items()
+
+    def values(self):
+        self["X"]
+        return super().values()
 
 class MockBehaviorModel:
     """A tiny 2-layer MLP over byte-ngrams that simulates three behaviors.
     Exposes activations and simple gradients for discovery experiments.
     """
-    def __init__(self, encoder: ByteNGramEncoder, d_hidden: int = 64, seed: int = 42):
+    def __init__(self, encoder: ByteNGramEncoder, d_hidden: int = 64, seed: int = 42, sparse_input: bool = False):
         self.encoder = encoder
+        self.sparse_input = sparse_input
         rng = np.random.RandomState(seed)
         d_in = encoder.dim
         self.W1 = rng.normal(scale=0.2, size=(d_in, d_hidden)).astype(np.float32)
@@ -24,13 +66,40 @@ class MockBehaviorModel:
         for p in ["therefore","moreover","thus"]: bump(p, 1, 2.0) # formality
         for p in ["I cannot","won't do","inappropriate"]: bump(p, 2, 2.0) # refusal
 
-    def forward(self, texts: List[str]) -> Dict[str, np.ndarray]:
-        X = np.stack([self.encoder.encode(t) for t in texts], axis=0)  # n x d
+    @classmethod
+    def from_weights(cls, encoder: ByteNGramEncoder, W1: np.ndarray, b1: np.ndarray, W2: np.ndarray, b2: np.ndarray, sparse_input: bool = False) -> "MockBehaviorModel":
+        """Wrap existing weight arrays (e.g. views into shared memory) without copying or re-initializing."""
+        m = cls.__new__(cls)
+        m.encoder, m.sparse_input = encoder, sparse_input
+        m.W1, m.b1, m.W2, m.b2 = W1, b1, W2, b2
+        return m
+
+    def forward(self, texts: List[str], sparse: bool = None) -> Dict[str, np.ndarray]:
+        if sparse is None:
+            sparse = self.sparse_input
+        if sparse:
+            return self._forward_sparse(texts)
+        X = self.encoder.encode_batch(texts)  # n x d
         Z1 = X @ self.W1 + self.b1
         H1 = np.maximum(Z1, 0.0)  # ReLU
         Z2 = H1 @ self.W2 + self.b2  # n x 3
         return {"X":X, "Z1":Z1, "H1":H1, "Z2":Z2}
 
+    def _forward_sparse(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        # Gather only the touched rows of W1: Z1[i] = sum_j count_ij * R_j * W1[j]
+        csr = self.encoder.encode_batch(texts, sparse=True)
+        vals = csr.data * self.encoder.R[csr.indices]
+        contrib = self.W1[csr.indices] * vals[:, None]  # nnz x d_hidden
+        Z1 = np.zeros((csr.shape[0], self.W1.shape[1]), dtype=np.float32)
+        nonempty = np.diff(csr.indptr) > 0
+        if contrib.shape[0]:
+            # Empty rows hold no entries, so each nonempty start segment ends at the next one
+            Z1[nonempty] = np.add.reduceat(contrib, csr.indptr[:-1][nonempty], axis=0)
+        Z1 += self.b1
+        H1 = np.maximum(Z1, 0.0)
+        Z2 = H1 @ self.W2 + self.b2
+        return LazyActivations(csr, self.encoder.R, Z1=Z1, H1=H1, Z2=Z2)
+
     def behavior_scores(self, texts: List[str]) -> Dict[str, np.ndarray]:
         Z2 = self.forward(texts)["Z2"]
         return {"hedging":Z2[:,0], "formality":Z2[:,1], "refusal":Z2[:,2]}
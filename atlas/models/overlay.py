@@ -0,0 +1,86 @@
+
+import numpy as np
+from typing import Dict, List, Optional
+from .mock import MockBehaviorModel
+
+class OverlayModel:
+    """Copy-on-write view over a MockBehaviorModel where pending edits touch W2 only.
+    The overlay stores just the edited W2 rows; W1, biases and the encoder are shared with the base.
+    forward() reuses the base activations and corrects Z2 for the edited rows; commit() writes the rows back.
+    The full W2 is materialized on first read after a write and cached (read-only) until the next write.
+    """
+    def __init__(self, base: MockBehaviorModel):
+        self.base = base
+        self.rows = np.zeros(0, dtype=np.int64)                          # edited row indices (sorted)
+        self.vals = np.zeros((0, base.W2.shape[1]), dtype=base.W2.dtype)  # their new values
+        self._W2: Optional[np.ndarray] = None
+        self._W2_of: Optional[np.ndarray] = None  # base.W2 the cached view was built from
+
+    @property
+    def encoder(self):
+        return self.base.encoder
+
+    @property
+    def W1(self) -> np.ndarray:
+        return self.base.W1
+
+    @property
+    def b1(self) -> np.ndarray:
+        return self.base.b1
+
+    @property
+    def b2(self) -> np.ndarray:
+        return self.base.b2
+
+    @property
+    def W2(self) -> np.ndarray:
+        if self._W2 is None or self._W2_of is not self.base.W2:
+            W = self.base.W2.copy()
+            W[self.rows] = self.vals
+            W.setflags(write=False)
+            self._W2, self._W2_of = W, self.base.W2
+        return self._W2
+
+    @W2.setter
+    def W2(self, value: np.ndarray) -> None:
+        changed = np.flatnonzero(np.any(value != self.base.W2, axis=1))
+        self.rows = changed
+        self.vals = np.asarray(value[changed], dtype=self.base.W2.dtype).copy()
+        self._W2 = None
+
+    def add_w2_delta(self, dW2: np.ndarray) -> None:
+        """Accumulate dW2 into the overlay touching only its nonzero rows."""
+        touched = np.flatnonzero(np.any(dW2 != 0, axis=1))
+        rows = np.union1d(self.rows, touched)
+        vals = self.base.W2[rows].copy()
+        vals[np.searchsorted(rows, self.rows)] = self.vals
+        vals[np.searchsorted(rows, touched)] += dW2[touched]
+        self.rows, self.vals = rows, vals
+        self._W2 = None
+
+    def forward(self, texts: List[str], sparse: bool = None) -> Dict[str, np.ndarray]:
+        out = self.base.forward(texts, sparse=sparse)
+        if self.rows.size:
+            out["Z2"] = out["Z2"] + out["H1"][:, self.rows] @ (self.vals - self.base.W2[self.rows])
+        return out
+
+    def behavior_scores(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        Z2 = self.forward(texts)["Z2"]
+        return {"hedging":Z2[:,0], "formality":Z2[:,1], "refusal":Z2[:,2]}
+
+    def grad_wrt_H1(self, texts: List[str], behavior: str) -> np.ndarray:
+        idx = {"hedging":0,"formality":1,"refusal":2}[behavior]
+        return np.tile(self.W2[:, idx][None, :], (len(texts),1)).astype(np.float32)
+
+    def commit(self) -> MockBehaviorModel:
+        """Apply the pending rows to the base (as a new W2 array) and clear the overlay."""
+        W = self.base.W2.copy()
+        W[self.rows] = self.vals
+        self.base.W2 = W
+        self.discard()
+        return self.base
+
+    def discard(self) -> None:
+        self.rows = np.zeros(0, dtype=np.int64)
+        self.vals = np.zeros((0, self.base.W2.shape[1]), dtype=self.base.W2.dtype)
+        self._W2 = None
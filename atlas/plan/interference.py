@@ -0,0 +1,186 @@
+
+from __future__ import annotations
+from functools import cached_property
+import numpy as np
+import scipy.sparse as sp
+from typing import Dict, List, Optional, Tuple
+from .planner import PredictReport
+from ..core.spec import AtlasManifest
+
+class InterferenceIndex:
+    """All-pairs interference over an AtlasManifest.
+    Circuits are encoded as sparse circuit x row / circuit x col incidence matrices plus a row-normalized
+    effect_sig matrix, so overlap, cosine and risk (same formulas as predict_interference) come from
+    a few sparse matmuls instead of per-pair set construction. The matrices are built on first use;
+    plan risks only decode the circuits named in the plans.
+    """
+    def __init__(self, atlas: AtlasManifest):
+        self.atlas = atlas
+        self.circuits = atlas.circuits
+        self.version = atlas.version_of("circuits")
+        self.size = len(atlas.circuits)
+        self._features: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._full: Optional[Dict[str, np.ndarray]] = None
+
+    def is_current(self) -> bool:
+        """False once AtlasStore.add_circuit (or atlas.bump_version("circuits")) ran since the build, or the
+        circuit count changed. Other in-place edits need invalidate_interference_index."""
+        a = self.atlas
+        return a.circuits is self.circuits and a.version_of("circuits") == self.version and len(a.circuits) == self.size
+
+    @cached_property
+    def ids(self) -> List[str]:
+        return list(self.atlas.circuits)
+
+    @cached_property
+    def pos(self) -> Dict[str, int]:
+        return {cid: i for i, cid in enumerate(self.ids)}
+
+    @cached_property
+    def R(self) -> sp.csr_matrix:
+        return self._incidence(self.ids, 0)
+
+    @cached_property
+    def C(self) -> sp.csr_matrix:
+        return self._incidence(self.ids, 1)
+
+    @cached_property
+    def n_rows(self) -> np.ndarray:
+        return np.asarray(self.R.sum(1), dtype=np.float64).ravel()
+
+    @cached_property
+    def n_cols(self) -> np.ndarray:
+        return np.asarray(self.C.sum(1), dtype=np.float64).ravel()
+
+    @cached_property
+    def E(self) -> np.ndarray:
+        return self._signatures(self.ids)[0].astype(np.float32)
+
+    def features(self, cid: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Unique rows, unique cols and normalized effect_sig of one circuit (decoded once)."""
+        f = self._features.get(cid)
+        if f is None:
+            c = self.atlas.circuits[cid]
+            e = np.asarray(c.effect_sig, dtype=np.float32)
+            f = self._features[cid] = (np.unique(np.asarray(c.support.get("rows", []), dtype=np.int64)),
+                                       np.unique(np.asarray(c.support.get("cols", []), dtype=np.int64)),
+                                       e / (np.linalg.norm(e) + 1e-8))
+        return f
+
+    def _incidence(self, ids: List[str], k: int) -> sp.csr_matrix:
+        members = [self.features(cid)[k] for cid in ids]
+        counts = np.array([len(m) for m in members], dtype=np.int64)
+        flat = np.concatenate(members) if members else np.zeros(0, dtype=np.int64)
+        labels, cols = np.unique(flat, return_inverse=True)
+        rows = np.repeat(np.arange(len(ids)), counts)
+        return sp.csr_matrix((np.ones(len(flat), dtype=np.float64), (rows, cols.ravel())), shape=(len(ids), len(labels)))
+
+    def _signatures(self, ids: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        sigs = [self.features(cid)[2] for cid in ids]
+        lens = np.array([len(s) for s in sigs], dtype=np.int64)
+        E = np.zeros((len(sigs), max(lens, default=0)))
+        for i, s in enumerate(sigs):
+            E[i, :len(s)] = s  # signatures of different lengths are zero-padded
+        return E, lens
+
+    def _combine(self, I_r, I_c, nr, nc, cos) -> Dict[str, np.ndarray]:
+        # |a & b| over rows and cols, |a | b| = |a| + |b| - |a & b|
+        union = (nr[0] + nr[1] - I_r) + (nc[0] + nc[1] - I_c)
+        ov = (I_r + I_c) / (1.0 + union)
+        return {"overlap": ov, "cosine": cos, "risk": 0.7*ov + 0.3*np.maximum(0.0, cos)}
+
+    def matrices(self) -> Dict[str, np.ndarray]:
+        """Dense k x k overlap, cosine and risk matrices, computed once and cached."""
+        if self._full is None:
+            I_r = (self.R @ self.R.T).toarray(); I_c = (self.C @ self.C.T).toarray()
+            nr = (self.n_rows[:, None], self.n_rows[None, :]); nc = (self.n_cols[:, None], self.n_cols[None, :])
+            self._full = self._combine(I_r, I_c, nr, nc, (self.E @ self.E.T).astype(np.float64))
+        return self._full
+
+    def row(self, cid: str) -> Dict[str, np.ndarray]:
+        """Overlap, cosine and risk of one circuit against every circuit, without the full matrices."""
+        i = self.pos[cid]
+        I_r = (self.R[i] @ self.R.T).toarray().ravel(); I_c = (self.C[i] @ self.C.T).toarray().ravel()
+        return self._combine(I_r, I_c, (self.n_rows[i], self.n_rows), (self.n_cols[i], self.n_cols), (self.E @ self.E[i]).astype(np.float64))
+
+    def report(self, a: str, b: str) -> PredictReport:
+        m = {k: v[self.pos[a]] for k, v in self._full.items()} if self._full is not None else self.row(a)
+        j = self.pos[b]
+        risk = float(m["risk"][j])
+        return PredictReport(unsafe=(risk>0.7), risk=risk, reasons={"overlap": float(m["overlap"][j]), "cosine": float(m["cosine"][j])})
+
+    def plan_risk(self, circuit_ids: List[str]) -> float:
+        """Max pairwise risk among circuit_ids (0.0 for fewer than two circuits)."""
+        return self.plan_risks([circuit_ids])[0]
+
+    def pair_risk(self, a: List[str], b: List[str]) -> np.ndarray:
+        """Risk of the circuit pairs (a[i], b[i]); each pair's value does not depend on the rest of the batch.
+        Only the circuits named in a and b are decoded."""
+        ids = list(dict.fromkeys(list(a) + list(b)))
+        loc = {cid: i for i, cid in enumerate(ids)}
+        return self._pair_risk(ids, np.array([loc[c] for c in a], dtype=np.int64), np.array([loc[c] for c in b], dtype=np.int64))
+
+    def _pair_risk(self, ids: List[str], a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        R, C = self._incidence(ids, 0), self._incidence(ids, 1)
+        nr, nc = np.diff(R.indptr).astype(np.float64), np.diff(C.indptr).astype(np.float64)
+        I_r = np.asarray(R[a].multiply(R[b]).sum(1), dtype=np.float64).ravel()
+        I_c = np.asarray(C[a].multiply(C[b]).sum(1), dtype=np.float64).ravel()
+        # Cosines summed over each pair's own padded width, so the result never depends on the batch
+        E, lens = self._signatures(ids)
+        width = np.maximum(lens[a], lens[b])
+        cos = np.zeros(len(a))
+        for w in np.unique(width[width > 0]):
+            sel = np.flatnonzero(width == w)
+            cos[sel] = (E[a[sel], :w] * E[b[sel], :w]).sum(1)
+        return self._combine(I_r, I_c, (nr[a], nr[b]), (nc[a], nc[b]), cos)["risk"]
+
+    def plan_risks(self, plans: List[List[str]]) -> List[float]:
+        """plan_risk of every plan, scoring each distinct circuit pair once across the whole batch."""
+        ids = list(dict.fromkeys(cid for p in plans if len(p) > 1 for cid in p))
+        loc = {cid: i for i, cid in enumerate(ids)}
+        n = max(len(ids), 1)
+        keys, counts = [], []
+        for p in plans:
+            idx = np.array([loc[cid] for cid in p] if len(p) > 1 else [], dtype=np.int64)
+            i, j = np.triu_indices(len(idx), 1)
+            lo, hi = np.minimum(idx[i], idx[j]), np.maximum(idx[i], idx[j])
+            keys.append(lo * n + hi); counts.append(len(lo))
+        flat = np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+        uniq, inv = np.unique(flat, return_inverse=True)
+        risk = self._pair_risk(ids, uniq // n, uniq % n)[inv.ravel()] if len(uniq) else np.zeros(0)
+        out, start = [], 0
+        for c in counts:
+            out.append(float(max(0.0, risk[start:start+c].max())) if c else 0.0)
+            start += c
+        return out
+
+    def block(self, idx: np.ndarray) -> Dict[str, np.ndarray]:
+        """Matrices restricted to circuit positions idx; only touches the full matrices if already cached."""
+        if self._full is not None:
+            return {k: v[np.ix_(idx, idx)] for k, v in self._full.items()}
+        R, C, E = self.R[idx], self.C[idx], self.E[idx]
+        nr, nc = self.n_rows[idx], self.n_cols[idx]
+        return self._combine((R @ R.T).toarray(), (C @ C.T).toarray(), (nr[:, None], nr[None, :]), (nc[:, None], nc[None, :]), (E @ E.T).astype(np.float64))
+
+    def top_k(self, cid: str, k: int = 10) -> List[Tuple[str, float]]:
+        """The k circuits with the highest interference risk against cid, highest first."""
+        risk = self.row(cid)["risk"].copy()
+        risk[self.pos[cid]] = -np.inf
+        k = min(k, len(self.ids) - 1)
+        if k <= 0:
+            return []
+        part = np.argpartition(-risk, k-1)[:k]
+        part = part[np.argsort(-risk[part], kind="stable")]
+        return [(self.ids[j], float(risk[j])) for j in part]
+
+def interference_index(atlas: AtlasManifest) -> InterferenceIndex:
+    """Return the manifest's cached InterferenceIndex, rebuilding it if circuits changed."""
+    idx = getattr(atlas, "_interference", None)
+    if idx is None or not idx.is_current():
+        idx = InterferenceIndex(atlas)
+        atlas._interference = idx
+    return idx
+
+def invalidate_interference_index(atlas: AtlasManifest) -> None:
+    """Drop the cached index after editing circuits in place outside AtlasStore.add_circuit."""
+    atlas._interference = None
@@ -1,8 +1,9 @@
 
 from __future__ import annotations
 import numpy as np
+from dataclasses import dataclass
 from typing import Dict, List, Tuple
-from .planner import predict_interference
+from .interference import interference_index
 from ..core.spec import AtlasManifest, CircuitDiff
 
 def head_index_from_id(cid: str) -> int:
@@ -17,39 +18,89 @@ def proxy_effect_size(c: CircuitDiff) -> float:
     return float(len(rows)) if rows else 1.0
 
 def predict_plan_risk(atlas: AtlasManifest, circuit_ids: List[str]) -> float:
-    risk = 0.0
-    for i in range(len(circuit_ids)):
-        for j in range(i+1, len(circuit_ids)):
-            A = atlas.circuits[circuit_ids[i]]
-            B = atlas.circuits[circuit_ids[j]]
-            rep = predict_interference(A, B)
-            risk = max(risk, rep.risk)
-    return float(risk)
-
-def solve_knobs(atlas: AtlasManifest, circuit_ids: List[str], targets: Dict[str, float], max_mag: float = 0.8) -> Dict[str, float]:
-    """Grid-search small set of knob magnitudes to approximately meet targets per head while minimizing interference risk.
-    targets: map of behavior keyword -> desired signed strength (e.g., {'hedging': +1.0, 'formality': +0.5})
+    return interference_index(atlas).plan_risk(circuit_ids)
+
+def _target_head(k: str) -> int:
+    return 0 if k.startswith("hedg") else 1 if k.startswith("forma") else 2 if k.startswith("refus") else 0
+
+@dataclass
+class KnobSolution:
+    knobs: Dict[str, float]
+    objective: float                            # squared target error + 0.2 * plan risk
+    method: str                                 # "grid" or "pgd"
+    iterations: int
+    converged: bool
+    risk: float
+
+def effect_problem(atlas: AtlasManifest, circuit_ids: List[str], targets: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+    """Least-squares form of the knob objective: head error = ||A @ m - t||^2.
+    A[r, c] is circuit c's proxy effect if it drives the head of target r, else 0.
     """
-    # Candidate magnitudes
+    heads = np.array([head_index_from_id(cid) for cid in circuit_ids])
+    eff = np.array([proxy_effect_size(atlas.circuits[cid]) for cid in circuit_ids], dtype=np.float64)
+    t_heads = np.array([_target_head(k) for k in targets])
+    A = (t_heads[:, None] == heads[None, :]) * eff[None, :]
+    return A, np.array(list(targets.values()), dtype=np.float64)
+
+def _solve_grid(atlas, circuit_ids, targets, max_mag) -> Tuple[np.ndarray, float, int]:
+    # Exhaustive over 5 magnitudes per circuit, same enumeration order (and tie-breaking) as np.ndindex
     mags = np.linspace(0.0, max_mag, num=5)
-    best = None; best_obj = 1e9
-    # Build mapping from circuit to target head
-    head_map = {cid: head_index_from_id(cid) for cid in circuit_ids}
-    for combo in np.ndindex(*(len(mags),)*len(circuit_ids)):
-        knobs = {cid: float(mags[i]) for i, cid in enumerate(circuit_ids)}
-        # Objective: squared error to targets using proxy effects + penalty for interference
-        head_effect = {0:0.0,1:0.0,2:0.0}
-        for cid, m in knobs.items():
-            h = head_map[cid]
-            eff = proxy_effect_size(atlas.circuits[cid]) * m
-            head_effect[h] += eff
-        err = 0.0
-        for k, t in targets.items():
-            h = 0 if k.startswith("hedg") else 1 if k.startswith("forma") else 2 if k.startswith("refus") else 0
-            err += (head_effect[h] - t)**2
-        # Interference penalty
-        risk = predict_plan_risk(atlas, circuit_ids)
-        obj = err + 0.2 * risk
-        if obj < best_obj:
-            best_obj = obj; best = knobs
-    return best or {cid: 0.0 for cid in circuit_ids}
+    k = len(circuit_ids)
+    combos = np.indices((len(mags),)*k).reshape(k, -1).T
+    head_effect = np.zeros((combos.shape[0], 3))
+    for i, cid in enumerate(circuit_ids):
+        head_effect[:, head_index_from_id(cid)] += proxy_effect_size(atlas.circuits[cid]) * mags[combos[:, i]]
+    err = np.zeros(combos.shape[0])
+    for key, t in targets.items():
+        err += (head_effect[:, _target_head(key)] - t)**2
+    best = int(np.argmin(err))
+    return mags[combos[best]], float(err[best]), combos.shape[0]
+
+def _solve_pgd(A: np.ndarray, t: np.ndarray, max_mag: float, tol: float, max_iter: int) -> Tuple[np.ndarray, float, int, bool]:
+    # Accelerated projected gradient (FISTA) on ||A m - t||^2 over the box [0, max_mag]^k
+    k = A.shape[1]
+    m = np.zeros(k); y = m.copy(); step_t = 1.0
+    L = 2.0 * float(np.linalg.norm(A, 2)**2) if A.size else 0.0
+    if L <= 0.0:
+        return m, float(t @ t), 0, True
+    AtA, Atb = A.T @ A, A.T @ t
+    it, converged = 0, False
+    for it in range(1, max_iter+1):
+        m_new = np.clip(y - (2.0 * (AtA @ y - Atb)) / L, 0.0, max_mag)
+        t_new = (1.0 + np.sqrt(1.0 + 4.0 * step_t * step_t)) / 2.0
+        y = m_new + ((step_t - 1.0) / t_new) * (m_new - m)
+        done = np.linalg.norm(m_new - m) <= tol * (1.0 + np.linalg.norm(m))
+        m, step_t = m_new, t_new
+        if done:
+            converged = True
+            break
+    r = A @ m - t
+    return m, float(r @ r), it, converged
+
+def solve_knobs_detailed(atlas: AtlasManifest, circuit_ids: List[str], targets: Dict[str, float], max_mag: float = 0.8,
+                         method: str = "pgd", grid_max: int = 8, tol: float = 1e-9, max_iter: int = 10000) -> KnobSolution:
+    """Solve the knob objective over the box [0, max_mag] with projected gradient (method="pgd"),
+    or exhaustively over 5 magnitude levels per circuit (method="grid", at most grid_max circuits).
+    The interference penalty does not depend on the knobs, so it is computed once and only reported.
+    """
+    if not circuit_ids:
+        return KnobSolution({}, 0.0, method, 0, True, 0.0)
+    risk = predict_plan_risk(atlas, circuit_ids)
+    if method == "grid":
+        if len(circuit_ids) > grid_max:
+            raise ValueError(f"Grid search over {len(circuit_ids)} circuits exceeds grid_max={grid_max}; use method='pgd'")
+        m, err, iters = _solve_grid(atlas, circuit_ids, targets, max_mag)
+        converged = True
+    elif method == "pgd":
+        A, t = effect_problem(atlas, circuit_ids, targets)
+        m, err, iters, converged = _solve_pgd(A, t, max_mag, tol, max_iter)
+    else:
+        raise ValueError(f"Unknown knob solver method: {method}")
+    knobs = {cid: float(m[i]) for i, cid in enumerate(circuit_ids)}
+    return KnobSolution(knobs, err + 0.2 * risk, method, iters, converged, risk)
+
+def solve_knobs(atlas: AtlasManifest, circuit_ids: List[str], targets: Dict[str, float], max_mag: float = 0.8, method: str = "pgd") -> Dict[str, float]:
+    """Choose knob magnitudes to approximately meet targets per head while minimizing interference risk.
+    targets: map of behavior keyword -> desired signed strength (e.g., {'hedging': +1.0, 'formality': +0.5})
+    """
+    return solve_knobs_detailed(atlas, circuit_ids, targets, max_mag=max_mag, method=method).knobs
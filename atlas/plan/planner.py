@@ -1,7 +1,8 @@
 
-import numpy as np, networkx as nx
+import numpy as np
 from typing import Dict, List, Tuple
 from dataclasses import dataclass
+from ..core.dag_index import DagIndex
 
 @dataclass
 class PredictReport:
@@ -10,19 +11,9 @@ class PredictReport:
     reasons: Dict[str,float]
 
 def dependency_plan(dag_edges: Dict[str, List[str]], target: str) -> List[str]:
-    G = nx.DiGraph()
-    for parent, children in dag_edges.items():
-        for ch in children:
-            G.add_edge(parent, ch)
-    # Collect all ancestors of target
-    req = set()
-    def dfs(u):
-        req.add(u)
-        for v in G.predecessors(u):
-            if v not in req: dfs(v)
-    dfs(target)
-    order = list(nx.topological_sort(G.subgraph(req)))
-    return order
+    """target and all its ancestors in topological order. A bare dict carries no version to cache against, so
+    the index is built per call (O(V + E)); Planner goes through the manifest's cached dag_index instead."""
+    return DagIndex(dag_edges).ancestors(target)
 
 def overlap_score(support_a: Dict, support_b: Dict) -> float:
     ra = set(support_a.get("rows", [])); rb = set(support_b.get("rows", []))
@@ -1,9 +1,10 @@
 
 from __future__ import annotations
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, Sequence, Tuple, Union
 from dataclasses import dataclass
-from .planner import dependency_plan, predict_interference
+from ..core.dag_index import dag_index
+from .interference import interference_index
 from ..core.spec import Plan, AtlasManifest
 
 @dataclass
@@ -17,15 +18,26 @@ class Planner:
 
     def build_plan(self, target_behavior_id: str, magnitude: float = 0.5) -> Plan:
         # Simple: decompose via DAG and set knob=magnitude for the leaf circuit
-        order = dependency_plan(self.atlas.dag, target_behavior_id) if self.atlas.dag else [target_behavior_id]
+        order = dag_index(self.atlas).ancestors(target_behavior_id)
         circuits = order
         knobs = {cid: magnitude for cid in circuits}
-        # Heuristic interference risk
-        risk = 0.0
-        for i in range(len(circuits)):
-            for j in range(i+1, len(circuits)):
-                A = self.atlas.circuits[circuits[i]]
-                B = self.atlas.circuits[circuits[j]]
-                rep = predict_interference(A, B)
-                risk = max(risk, rep.risk)
+        # Heuristic interference risk (max over pairs)
+        risk = interference_index(self.atlas).plan_risk(circuits)
         return Plan(circuits=circuits, knobs=knobs, predicted_deltas=[], predicted_interference=risk, stability_margins={})
+
+    def build_plans(self, targets: Sequence[str], magnitudes: Union[float, Sequence[float]] = 0.5,
+                    chunk_size: int = 1024) -> List[Plan]:
+        """build_plan for many targets; returns the same Plans in the same order.
+        Dependency orders come from the shared DagIndex, and every distinct circuit pair within a chunk of
+        chunk_size targets is scored once (chunk_size bounds the size of each batch of pairs).
+        """
+        mags = [float(magnitudes)] * len(targets) if np.isscalar(magnitudes) else [float(m) for m in magnitudes]
+        assert len(mags) == len(targets), "one magnitude per target"
+        dag, ii = dag_index(self.atlas), interference_index(self.atlas)
+        plans: List[Plan] = []
+        for lo in range(0, len(targets), chunk_size):
+            orders = [dag.ancestors(t) for t in targets[lo:lo + chunk_size]]
+            risks = ii.plan_risks(orders)
+            plans.extend(Plan(circuits=o, knobs={cid: m for cid in o}, predicted_deltas=[], predicted_interference=r, stability_margins={})
+                         for o, m, r in zip(orders, mags[lo:lo + chunk_size], risks))
+        return plans
@@ -1,11 +1,89 @@
 
 import numpy as np, hashlib
-from typing import List
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+@dataclass
+class CSRCounts:
+    """CSR-style sparse n-gram count matrix (n_texts x dim).
+    Row i holds buckets indices[indptr[i]:indptr[i+1]] (sorted) with counts data[...].
+    """
+    indptr: np.ndarray    # int64, n_texts+1
+    indices: np.ndarray   # int64, nnz
+    data: np.ndarray      # float32 counts, nnz
+    shape: Tuple[int, int]
+
+    def row(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        s, e = self.indptr[i], self.indptr[i+1]
+        return self.indices[s:e], self.data[s:e]
+
+    def row_ids(self) -> np.ndarray:
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    def toarray(self, signs: Optional[np.ndarray] = None) -> np.ndarray:
+        """Dense float32 matrix; multiply by per-bucket `signs` (e.g. encoder.R) if given."""
+        out = np.zeros(self.shape, dtype=np.float32)
+        out[self.row_ids(), self.indices] = self.data
+        if signs is not None:
+            out *= signs
+        return out
+
+class EncodingCache:
+    """Bounded LRU of encoded rows keyed by (text, n, dim, seed).
+    Values are (bucket indices, counts) pairs; the budget covers their bytes plus the key text.
+    One cache may be shared by several encoders since the config is part of the key.
+    """
+    def __init__(self, max_bytes: int = 32 << 20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._rows: "OrderedDict[Tuple, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+
+    @staticmethod
+    def _size(key: Tuple, row: Tuple[np.ndarray, np.ndarray]) -> int:
+        return len(key[0]) + row[0].nbytes + row[1].nbytes
+
+    def get(self, key: Tuple) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        row = self._rows.get(key)
+        if row is None:
+            self.misses += 1
+            return None
+        self._rows.move_to_end(key)
+        self.hits += 1
+        return row
+
+    def put(self, key: Tuple, row: Tuple[np.ndarray, np.ndarray]) -> None:
+        size = self._size(key, row)
+        if size > self.max_bytes:
+            return
+        old = self._rows.pop(key, None)
+        if old is not None:
+            self.nbytes -= self._size(key, old)
+        self._rows[key] = row
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            k, v = self._rows.popitem(last=False)
+            self.nbytes -= self._size(k, v)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._rows.clear()
+        self.nbytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._rows), "bytes": self.nbytes, "max_bytes": self.max_bytes}
 
 class ByteNGramEncoder:
-    def __init__(self, n: int = 3, dim: int = 256, seed: int = 1234):
+    def __init__(self, n: int = 3, dim: int = 256, seed: int = 1234, cache: Optional[EncodingCache] = None, cache_bytes: int = 32 << 20):
         self.n = n
         self.dim = dim
+        self.seed = seed
+        # Pass cache_bytes=0 to disable caching
+        self.cache = cache if cache is not None else (EncodingCache(cache_bytes) if cache_bytes > 0 else None)
         rng = np.random.RandomState(seed)
         # Random projection matrix (+1/-1)
         self.R = rng.choice([-1.0, 1.0], size=(dim,), p=[0.5,0.5]).astype(np.float32)
@@ -14,10 +92,86 @@ class ByteNGramEncoder:
         b = text.encode('utf-8', errors='ignore')
         return [b[i:i+self.n] for i in range(max(0,len(b)-self.n+1))]
 
+    def _bucket(self, ng: bytes) -> int:
+        # Same as int(sha256(ng).hexdigest(), 16) % dim, without the hex round-trip
+        return int.from_bytes(hashlib.sha256(ng).digest(), "big") % self.dim
+
+    @property
+    def config(self) -> Tuple[int, int, int]:
+        return (self.n, self.dim, self.seed)
+
     def encode(self, text: str) -> np.ndarray:
         vec = np.zeros(self.dim, dtype=np.float32)
-        for ng in self._ngrams(text):
-            h = int(hashlib.sha256(ng).hexdigest(), 16) % self.dim
-            vec[h] += 1.0
+        row = self.cache.get((text,) + self.config) if self.cache is not None else None
+        if row is not None:
+            vec[row[0]] = row[1]
+        else:
+            for ng in self._ngrams(text):
+                vec[self._bucket(ng)] += 1.0
+            if self.cache is not None:
+                idx = np.flatnonzero(vec)
+                self.cache.put((text,) + self.config, (idx, vec[idx]))
         # Signed random projection (SimHash-like)
         return vec * self.R
+
+    def _count_batch(self, texts: List[str]) -> CSRCounts:
+        n, m = self.n, len(texts)
+        raw = [t.encode('utf-8', errors='ignore') for t in texts]
+        lens = np.array([len(b) for b in raw], dtype=np.int64)
+        n_grams = np.maximum(lens - n + 1, 0)
+        total = int(n_grams.sum())
+        if total == 0:
+            return CSRCounts(np.zeros(m+1, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32), (m, self.dim))
+        buf = np.frombuffer(b"".join(raw), dtype=np.uint8)
+        # Start offset of every n-gram window, never crossing a text boundary
+        text_starts = np.concatenate([[0], np.cumsum(lens)[:-1]])
+        row_of = np.repeat(np.arange(m), n_grams)
+        first = np.concatenate([[0], np.cumsum(n_grams)[:-1]])
+        starts = text_starts[row_of] + (np.arange(total) - first[row_of])
+        windows = buf[starts[:, None] + np.arange(n)[None, :]]
+        keys = np.ascontiguousarray(windows).view(f"V{n}").ravel()
+        # Hash each distinct n-gram once
+        uniq, inv = np.unique(keys, return_inverse=True)
+        table = np.fromiter((self._bucket(u.tobytes()) for u in uniq), dtype=np.int64, count=len(uniq))
+        flat, counts = np.unique(row_of * self.dim + table[inv.ravel()], return_counts=True)
+        rows, indices = np.divmod(flat, self.dim)
+        indptr = np.zeros(m+1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=m), out=indptr[1:])
+        return CSRCounts(indptr, indices, counts.astype(np.float32), (m, self.dim))
+
+    def _count_cached(self, texts: List[str]) -> CSRCounts:
+        cfg = self.config
+        rows: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        todo: Dict[str, None] = {}  # ordered set of distinct misses
+        for t in texts:
+            if t in rows or t in todo:
+                continue
+            row = self.cache.get((t,) + cfg)
+            if row is None:
+                todo[t] = None
+            else:
+                rows[t] = row
+        if todo:
+            fresh = self._count_batch(list(todo))
+            for i, t in enumerate(todo):
+                idx, cnt = fresh.row(i)
+                rows[t] = (idx.copy(), cnt.copy())  # don't pin the whole batch buffers
+                self.cache.put((t,) + cfg, rows[t])
+        parts = [rows[t] for t in texts]
+        indptr = np.zeros(len(texts)+1, dtype=np.int64)
+        np.cumsum([len(p[0]) for p in parts], out=indptr[1:])
+        if not parts:
+            return CSRCounts(indptr, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32), (0, self.dim))
+        indices = np.concatenate([p[0] for p in parts]).astype(np.int64, copy=False)
+        data = np.concatenate([p[1] for p in parts]).astype(np.float32, copy=False)
+        return CSRCounts(indptr, indices, data, (len(texts), self.dim))
+
+    def encode_batch(self, texts: List[str], sparse: bool = False):
+        """Encode many texts at once. Matches np.stack([encode(t) for t in texts]) exactly.
+        sparse=True returns the unsigned CSRCounts (apply self.R for the signed projection).
+        """
+        texts = list(texts)
+        counts = self._count_batch(texts) if self.cache is None else self._count_cached(texts)
+        if sparse:
+            return counts
+        return counts.toarray(signs=self.R)
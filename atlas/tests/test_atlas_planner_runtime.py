@@ -6,6 +6,7 @@ from atlas.discover.min_pairs import minimal_pairs
 from atlas.discover.mine import differential_salience, iterative_prune_preserve
 from atlas.discover.to_circuit import mask_to_circuit
 from atlas.core.atlas_store import AtlasStore
+from atlas.core.spec import AtlasManifest
 from atlas.plan.planner_obj import Planner
 from atlas.txn.runtime import apply_plan_with_invariants
 
@@ -52,3 +53,141 @@ def test_plan_and_apply_rollback_on_failure():
         base_safety = board["safety"](model)
         new_safety = board["safety"](maybe)
         assert abs(base_safety - new_safety) < 1e-6
+
+def test_knob_solver_pgd_vs_grid():
+    from atlas.core.spec import CircuitDiff, AtlasManifest
+    from atlas.plan.knob_solver import solve_knobs_detailed
+    circs = {f"behavior/{b}@{i}": CircuitDiff(f"behavior/{b}@{i}", {"rows": list(range(i+1)), "cols": []}, "", {})
+             for i, b in enumerate(["hedging", "formality", "refusal", "hedging"])}
+    atlas = AtlasManifest(version="v0.1", family="mock", projections={}, circuits=circs, dag={}, token_semantics={})
+    ids = list(circs)
+    targets = {"hedging": 0.9, "formality": 0.5, "refusal": 1.1}
+    grid = solve_knobs_detailed(atlas, ids, targets, method="grid")
+    pgd = solve_knobs_detailed(atlas, ids, targets)
+    assert set(pgd.knobs) == set(ids) and pgd.converged
+    assert all(0.0 <= v <= 0.8 for v in pgd.knobs.values())
+    assert pgd.objective <= grid.objective + 1e-9
+    # Many circuits: grid is refused, pgd still solves
+    big = {f"behavior/hedging@{i}": CircuitDiff(f"behavior/hedging@{i}", {"rows": [i], "cols": []}, "", {}) for i in range(50)}
+    atlas_big = AtlasManifest(version="v0.1", family="mock", projections={}, circuits=big, dag={}, token_semantics={})
+    sol = solve_knobs_detailed(atlas_big, list(big), {"hedging": 4.0})
+    assert abs(sum(sol.knobs.values()) - 4.0) < 1e-6
+
+def test_interference_index_matches_pairwise():
+    import numpy as np
+    from atlas.core.spec import CircuitDiff, AtlasManifest
+    from atlas.plan.planner import predict_interference
+    from atlas.plan.interference import interference_index
+    rng = np.random.RandomState(0)
+    circs = {f"c{i}": CircuitDiff(f"c{i}", {"rows": rng.choice(20, 5).tolist(), "cols": rng.choice(5, i % 3).tolist()}, "", {},
+                                  effect_sig=rng.randn(4).tolist() if i % 2 else []) for i in range(12)}
+    atlas = AtlasManifest(version="v0.1", family="mock", projections={}, circuits=circs, dag={}, token_semantics={})
+    idx = interference_index(atlas)
+    risk = idx.matrices()["risk"]
+    for a in circs:
+        for b in circs:
+            assert abs(risk[idx.pos[a], idx.pos[b]] - predict_interference(circs[a], circs[b]).risk) < 1e-6
+    top = idx.top_k("c0", 3)
+    expected = sorted((predict_interference(circs["c0"], circs[b]).risk for b in circs if b != "c0"), reverse=True)[:3]
+    assert np.allclose([r for _, r in top], expected)
+    assert interference_index(atlas) is idx
+    atlas.circuits["c12"] = CircuitDiff("c12", {"rows": [1]}, "", {})
+    assert interference_index(atlas) is not idx
+    idx = interference_index(atlas)
+    atlas.circuits["c0"] = CircuitDiff("c0", {"rows": [1]}, "", {}, effect_sig=[1.0, 0.0, 0.5, 0.0])
+    atlas.bump_version("circuits")
+    fresh = interference_index(atlas)
+    assert fresh is not idx
+    assert np.isclose(fresh.plan_risk(["c0", "c12", "c3"]), max(predict_interference(circs[a], circs[b]).risk
+                                                                 for a, b in [("c0", "c12"), ("c0", "c3"), ("c12", "c3")]))
+    assert "R" not in fresh.__dict__ and len(fresh._features) == 3  # plan risk decodes only the plan's circuits
+
+def test_overlay_model_matches_edited_copy():
+    import numpy as np
+    from atlas.models.overlay import OverlayModel
+    base = MockBehaviorModel(ByteNGramEncoder(dim=128), d_hidden=32)
+    W2_before = base.W2.copy()
+    dW2 = np.zeros_like(base.W2); dW2[[2, 5], 0] = 0.5
+    ov = OverlayModel(base)
+    ov.add_w2_delta(dW2)
+    ov.W2 = ov.W2 + dW2  # whole-matrix assignment path
+    assert list(ov.rows) == [2, 5] and np.array_equal(base.W2, W2_before)
+    assert ov.W2 is ov.W2 and not ov.W2.flags.writeable  # materialized once per write
+    edited = copy.deepcopy(base); edited.W2 = edited.W2 + 2 * dW2
+    texts = ["maybe it could rain", "clearly it will rain"]
+    assert np.allclose(ov.forward(texts)["Z2"], edited.forward(texts)["Z2"], atol=1e-5)
+    ov.commit()
+    assert np.allclose(base.W2, edited.W2) and ov.rows.size == 0 and np.array_equal(ov.W2, base.W2)
+
+def test_invariant_evaluator_matches_board_and_caches_baseline():
+    import numpy as np
+    from atlas.models.overlay import OverlayModel
+    from atlas.tests.invariants import regression_board, evaluate_invariants, InvariantEvaluator
+    base = MockBehaviorModel(ByteNGramEncoder(dim=128), d_hidden=32)
+    edited = copy.deepcopy(base); edited.W2[:4, 2] -= 0.3
+    board = regression_board()
+    policy = {"instruction_following": (board["instruction_following"], 0.9, True),
+              "safety": (board["safety"], 0.9, True), "neutrality": (board["neutrality"], 0.8, False)}
+    ok, ref = evaluate_invariants(base, edited, policy)
+    ev = InvariantEvaluator()
+    ok2, got = ev.evaluate(base, edited)
+    assert ok == ok2 and ref.keys() == got.keys()
+    assert all(np.isclose(ref[k], got[k], rtol=1e-5) for k in ref)
+    ov = OverlayModel(base); ov.W2 = edited.W2
+    ok3, got3 = ev.evaluate(base, ov)
+    assert ok3 == ok and all(np.isclose(got[k], got3[k], rtol=1e-5) for k in got)
+    assert ev.stats["forwards"] == 2 and ev.stats["baseline_hits"] == 1  # baseline once, edited copy once
+    assert ev.stats["fingerprints"] == 2  # one hash of the original per evaluate()
+
+def test_dag_index_incremental_leaves_and_cycles():
+    import pytest
+    from atlas.core.dag_index import DagIndex, dag_index, invalidate_dag_index
+    from atlas.core.hierarchy import decompose
+    from atlas.plan.planner import dependency_plan
+    store = AtlasStore("/mnt/data/universal_atlas/atlas/dag_atlas.json").new()
+    for p, c in [("persona", "a"), ("persona", "b"), ("a", "x"), ("b", "x"), ("b", "y")]:
+        store.add_edge(p, c)
+    m = store.manifest
+    assert decompose(m, "persona") == ["x", "y"] and decompose(m, "x") == ["x"]
+    assert dependency_plan(m.dag, "x") == ["persona", "a", "b", "x"] or dependency_plan(m.dag, "x") == ["persona", "b", "a", "x"]
+    store.add_edge("y", "z")  # incremental: memoized leaves of y's ancestors are refreshed
+    assert decompose(m, "persona") == ["x", "z"]
+    with pytest.raises(ValueError):
+        store.add_edge("z", "persona")
+    assert "z" not in m.dag and dag_index(m).version == m.version_of("dag")
+    fresh = DagIndex(m.dag)
+    assert all(fresh.leaves(n) == dag_index(m).leaves(n) and fresh.ancestors(n) == dag_index(m).ancestors(n) for n in fresh.ids)
+    chain = {f"n{i}": [f"n{i+1}"] for i in range(5000)}  # deeper than the recursion limit
+    assert decompose(AtlasManifest("v", "f", {}, {}, chain, {}), "n0") == ["n5000"]
+    assert len(dependency_plan(chain, "n5000")) == 5001
+    m.dag["a"] = ["y"]  # in-place edit with unchanged node/edge counts
+    invalidate_dag_index(m)
+    assert decompose(m, "a") == ["z"]
+    d = {"p": ["a"], "q": ["b"]}
+    assert dependency_plan(d, "b") == ["q", "b"]
+    d["p"] = ["b"]
+    assert dependency_plan(d, "b") in (["p", "q", "b"], ["q", "p", "b"])
+
+def test_build_plans_matches_build_plan():
+    import numpy as np
+    from atlas.core.spec import CircuitDiff
+    from atlas.plan.interference import interference_index
+    rng = np.random.RandomState(0)
+    store = AtlasStore("/mnt/data/universal_atlas/atlas/batch_plans.json").new()
+    ids = [f"c{i}" for i in range(40)]
+    for cid in ids:
+        rows = sorted(rng.choice(64, size=rng.randint(1, 12), replace=False).tolist())
+        store.add_circuit(CircuitDiff(circuit_id=cid, support={"layer": 1, "rows": rows, "cols": []}, basis_blob="",
+                                      deltas={}, effect_sig=rng.randn(4).tolist()))
+    for j in range(1, 40):
+        for i in rng.choice(j, size=min(j, 2), replace=False):
+            store.add_edge(ids[i], ids[j])
+    planner = Planner(store.manifest)
+    mags = rng.rand(40).tolist()
+    plans = planner.build_plans(ids, mags, chunk_size=7)
+    for cid, m, p in zip(ids, mags, plans):
+        assert p == planner.build_plan(cid, magnitude=m)
+    ii = interference_index(store.manifest)
+    for p in plans[-5:]:
+        blk = ii.block(np.array([ii.pos[c] for c in p.circuits]))["risk"]
+        assert np.isclose(p.predicted_interference, max(0.0, blk[np.triu_indices(len(p.circuits), 1)].max()))
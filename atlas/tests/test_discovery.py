@@ -1,20 +1,76 @@
 
+import os, tempfile
 import numpy as np
-from atlas.semantics.encoder import ByteNGramEncoder
+from atlas.semantics.encoder import ByteNGramEncoder, EncodingCache
 from atlas.discover.contrast import confounder_features, balance_weights, mmd2
 from atlas.discover.min_pairs import minimal_pairs
 from atlas.models.mock import MockBehaviorModel
-from atlas.discover.mine import differential_salience, iterative_prune_preserve, activation_patching_verify, isolation_score
+from atlas.discover.mine import differential_salience, iterative_prune_preserve, activation_patching_verify, isolation_score, isolation_scores, PruneEngine
 
 def test_confounders_and_balancing():
     enc = ByteNGramEncoder(dim=128)
     pos = ["maybe it could rain", "perhaps it will be cold", "it might snow later"]*5
     neg = ["clearly it will rain", "definitely cold front", "certainly snow is coming"]*5
-    Xp = confounder_features(pos, enc); Xn = confounder_features(neg, enc)
+    from atlas.discover.contrast import raw_confounders
     wpos, wneg = balance_weights(pos, neg, enc)
-    m_before = mmd2((Xp, np.ones(len(pos))), (Xn, np.ones(len(neg))))
-    m_after = mmd2((Xp, wpos), (Xn, wneg))
-    assert m_after <= m_before + 1e-5
+    assert np.all(wpos > 0) and np.isclose(wpos.mean(), 1.0, atol=1e-4) and np.all(wneg == 1)
+    # Weighting moves the pos confounder mean toward the neg mean (both in pos-standardized units)
+    Rp, Rn = raw_confounders(pos, enc), raw_confounders(neg, enc)
+    m, sd = Rp.mean(0), Rp.std(0) + 1e-6
+    gap = lambda w: np.linalg.norm(w @ ((Rp - m) / sd) / w.sum() - ((Rn - m) / sd).mean(0))
+    assert gap(wpos) < gap(np.ones(len(pos))) - 0.1
+
+def test_encode_batch_matches_encode():
+    enc = ByteNGramEncoder(dim=128)
+    texts = ["maybe it could rain", "", "ok", "héllo wörld ☃", "therefore thus"]*3
+    dense = enc.encode_batch(texts)
+    assert np.array_equal(dense, np.stack([enc.encode(t) for t in texts]))
+    csr = enc.encode_batch(texts, sparse=True)
+    assert csr.shape == dense.shape and np.array_equal(csr.toarray(signs=enc.R), dense)
+
+def test_encoding_cache_hits_and_budget():
+    cache = EncodingCache(max_bytes=4096)
+    enc = ByteNGramEncoder(dim=128, cache=cache)
+    texts = ["maybe it could rain", "clearly it will rain"]*4
+    first = enc.encode_batch(texts)
+    assert cache.misses == 2 and cache.hits == 0
+    assert np.array_equal(enc.encode_batch(texts), first)
+    assert cache.hits == 2
+    enc.encode_batch([f"prompt number {i} about the weather" for i in range(200)])
+    assert cache.nbytes <= cache.max_bytes and cache.evictions > 0
+
+def test_sparse_forward_matches_dense():
+    model = MockBehaviorModel(ByteNGramEncoder(dim=128), d_hidden=32)
+    texts = ["maybe it could rain", "", "clearly it will rain", "ok"]
+    dense = model.forward(texts)
+    sparse = model.forward(texts, sparse=True)
+    assert set(sparse) == set(dense) and len(sparse) == len(dense)
+    assert np.array_equal(sparse.get("X"), dense["X"])
+    for k in ("Z1", "H1", "Z2"):
+        assert np.allclose(dense[k], sparse[k], atol=1e-5)
+    assert np.array_equal(dict(model.forward(texts, sparse=True).items())["X"], dense["X"])
+
+def test_prune_engine_matches_masked_forward():
+    model = MockBehaviorModel(ByteNGramEncoder(dim=128), d_hidden=32)
+    pos = ["maybe it could rain", "perhaps it will be cold"]*4
+    neg = ["clearly it will rain", "definitely cold front"]*4
+    engine = PruneEngine(model, "hedging", pos, neg)
+    mask = np.zeros(32, dtype=bool); mask[::3] = True
+    def score(texts):
+        H1 = model.forward(texts)["H1"] * mask
+        return float((H1 @ model.W2 + model.b2)[:, 0].mean())
+    assert abs(engine.delta(mask) - (score(pos) - score(neg))) < 1e-4
+    sal = differential_salience(model, "hedging", pos, neg)["H1"]
+    for schedule in ("grow", "bisect", "backward"):
+        m = iterative_prune_preserve(model, "hedging", pos, neg, sal, keep_frac=0.2, schedule=schedule, engine=engine)
+        assert m.sum() > 0
+
+def test_isolation_scores_batched():
+    model = MockBehaviorModel(ByteNGramEncoder(dim=128), d_hidden=32)
+    masks = np.random.RandomState(0).rand(6, 32) < 0.3
+    batched = isolation_scores(model, "hedging", masks, n_pairs=16)
+    assert batched.shape == (6,)
+    assert np.allclose(batched, [isolation_score(model, "hedging", m, n_pairs=16) for m in masks])
 
 def test_minimal_pairs():
     pairs = minimal_pairs("hedging", n=8)
@@ -33,6 +89,77 @@ def test_discovery_pipeline_mock():
     iso = isolation_score(model, "hedging", mask, n_pairs=16)
     assert iso >= 0.5  # weak floor for mock model
 
+def test_run_discovery_parallel_matches_serial():
+    import json
+    from atlas.core.atlas_store import AtlasStore
+    from atlas.discover.scheduler import BehaviorJob, run_discovery
+    tmp = tempfile.mkdtemp()
+    model = MockBehaviorModel(ByteNGramEncoder(dim=128), d_hidden=32)
+    neg_path = os.path.join(tmp, "neg.jsonl")
+    with open(neg_path, "w") as f:
+        f.write("\n".join(json.dumps({"text": t}) for t in ["clearly it will rain", "definitely cold"]*6))
+    jobs = [BehaviorJob("hedging", pos=["maybe it could rain", "perhaps it will be cold"]*6, neg=neg_path),
+            BehaviorJob("refusal", pos=["I won't do that.", "That would be inappropriate."]*6, neg=["Sure, here's how."]*12)]
+    serial = AtlasStore(os.path.join(tmp, "serial.json")).new()
+    rep0 = run_discovery(model, jobs, serial, max_workers=0)
+    parallel = AtlasStore(os.path.join(tmp, "parallel.json")).new()
+    rep = run_discovery(model, jobs, parallel, max_workers=2)
+    assert rep["workers"] == 2 and set(rep["jobs"]) == {"behavior/hedging@v1", "behavior/refusal@v1"}
+    for cid in rep0["jobs"]:
+        assert serial.manifest.circuits[cid].support == parallel.manifest.circuits[cid].support
+        assert rep["jobs"][cid]["total_s"] > 0
+
+def test_differential_salience_stream_matches_in_memory():
+    from atlas.discover.mine import differential_salience, differential_salience_stream
+    tmp = tempfile.mkdtemp()
+    model = MockBehaviorModel(ByteNGramEncoder(dim=128), d_hidden=32)
+    pos = [f"maybe it could rain {i}" for i in range(37)]
+    neg = [f"clearly it will rain {i}" for i in range(23)]
+    path = os.path.join(tmp, "neg.txt")
+    with open(path, "w") as f:
+        f.write("\n".join(neg) + "\n")
+    ref = differential_salience(model, "hedging", pos, neg)["H1"]
+    out = differential_salience_stream(model, "hedging", iter(pos), path, chunk_size=5)
+    assert out["n_pos"] == 37 and out["n_neg"] == 23
+    assert np.allclose(out["H1"], ref, atol=1e-6)
+    assert np.allclose(out["H1_var_pos"], model.forward(pos)["H1"].astype(np.float64).var(0), atol=1e-6)
+    assert out["H1_se"].shape == ref.shape and np.all(out["H1_se"] >= 0)
+
+def test_streaming_confounders_match_batch():
+    from atlas.discover.contrast import text_stats, confounder_moments, balance_weights_stream
+    enc = ByteNGramEncoder(dim=64)
+    pos = [f"maybe, it could rain; day {i}!" for i in range(30)] + ["", "héllo—wörld?"]
+    neg = [f"clearly it will rain {i}." for i in range(17)]
+    lens, punct = text_stats(pos)
+    assert np.array_equal(lens, [len(t) for t in pos])
+    assert np.allclose(punct, [sum(ch in ',.;:!?-' for ch in t) / max(1, len(t)) for t in pos])
+    A = confounder_features(pos, enc).astype(np.float64)
+    mom = confounder_moments(iter(pos), enc, chunk_size=7)
+    scale = 1.0 / (np.sqrt(mom.var()) + 1e-6)
+    assert np.allclose(scale[:, None] * mom.C * scale[None, :], A.T @ A, rtol=1e-3, atol=1e-3)
+    w, w_neg = balance_weights_stream(pos, neg, enc, chunk_size=7)
+    w_ref, w_neg_ref = balance_weights(pos, neg, enc)
+    assert np.allclose(w, w_ref, atol=1e-3) and np.array_equal(w_neg, w_neg_ref) and w.std() > 0.05
+
+def test_mmd2_blockwise_rff_and_permutation_test():
+    from atlas.discover.contrast import mmd_permutation_test
+    rng = np.random.RandomState(0)
+    X, Y = rng.randn(150, 4), rng.randn(120, 4) + 0.7
+    wx, wy = rng.rand(150) + 0.5, np.ones(120)
+    def naive(X, wx, Y, wy, sigma=1.0):
+        k = lambda a, b: np.exp(-((a[:, None] - b[None]) ** 2).sum(-1) / (2 * sigma**2))
+        a, b = wx / wx.sum(), wy / wy.sum()
+        return a @ k(X, X) @ a + b @ k(Y, Y) @ b - 2 * a @ k(X, Y) @ b
+    ref = naive(X, wx, Y, wy)
+    assert np.isclose(mmd2((X, wx), (Y, wy), block=37), ref, rtol=1e-6)
+    assert abs(mmd2((X, wx), (Y, wy), method="rff", n_features=4096) - ref) < 0.02
+    shifted = mmd_permutation_test((X, wx), (Y, wy), n_perm=99, batch=32)
+    same = mmd_permutation_test((X, wx), (rng.randn(120, 4), wy), n_perm=99, method="exact", block=64)
+    assert shifted["p_value"] <= 0.02 and same["p_value"] > 0.05 and shifted["n_perm"] == 99
+    tiled = mmd_permutation_test((X, wx), (Y, wy), n_perm=40, method="exact", block=64)
+    whole = mmd_permutation_test((X, wx), (Y, wy), n_perm=40, method="exact", block=512)
+    assert np.isclose(tiled["mmd2"], whole["mmd2"]) and abs(tiled["p_value"] - whole["p_value"]) <= 1 / 41
+
 if __name__ == "__main__":
     tests = [obj for name, obj in globals().items() if name.startswith("test_")]
     passed, failed = 0, 0
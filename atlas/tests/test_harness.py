@@ -44,8 +44,253 @@ def test_transaction_apply_and_rollback():
     assert model.weights["layer0"][1].sum() == 10.0
     tx.rollback()
     assert np.allclose(model.weights["layer0"], W)
+    import pytest
+    with pytest.raises(AssertionError, match="Unknown savepoint"):
+        tx.release("missing")
     tx.commit()
 
+def test_binary_manifest_roundtrip_and_lazy_load():
+    import os, tempfile
+    from atlas.core.atlas_store import AtlasStore
+    from atlas.core.manifest_bin import json_to_binary, binary_to_json
+    d = tempfile.mkdtemp()
+    store = AtlasStore(os.path.join(d, "atlas.json")).new()
+    for i in range(50):
+        store.add_circuit(CircuitDiff(f"behavior/c{i}", {"layer": 1, "rows": [i]}, "sha256:x.npy", {"axis": [1.0]}))
+    store.add_edge("persona/p", "behavior/c3")
+    store.save()
+    json_to_binary(store.path, os.path.join(d, "atlas.atlasb"))
+    binary_to_json(os.path.join(d, "atlas.atlasb"), os.path.join(d, "back.json"))
+    assert open(store.path).read() == open(os.path.join(d, "back.json")).read()
+    man = AtlasStore(os.path.join(d, "atlas.atlasb")).load()
+    assert man.circuits["behavior/c7"].support["rows"] == [7]
+    assert man.circuits.n_decoded == 1 and len(man.circuits) == 50
+    assert man.dag == {"persona/p": ["behavior/c3"]}
+
+def test_journaled_store_replay_and_compact():
+    import os, tempfile
+    from atlas.core.atlas_store import AtlasStore
+    path = os.path.join(tempfile.mkdtemp(), "atlas.json")
+    store = AtlasStore(path, journal=True, group_commit=4).new()
+    store.add_circuit(CircuitDiff("behavior/c0", {"rows": [0]}, "", {}))
+    store.save()  # first save writes the base snapshot
+    snapshot = open(path).read()
+    for i in range(1, 6):
+        store.add_circuit(CircuitDiff(f"behavior/c{i}", {"rows": [i]}, "", {}))
+    store.add_edge("persona/p", "behavior/c1")
+    store.save()
+    assert open(path).read() == snapshot  # mutations went to the journal only
+    with open(store.journal_path, "ab") as f:
+        f.write(b'{"op":"edge","p":')  # torn record from a crash mid-append
+    size = os.path.getsize(store.journal_path)
+    from atlas.core.blobstore import collect_garbage
+    collect_garbage([path], root=tempfile.mkdtemp(), dry_run=True)
+    assert os.path.getsize(store.journal_path) == size  # readers never cut a (possibly live) torn tail
+    reopened = AtlasStore(path, journal=True)
+    man = reopened.load()
+    assert len(man.circuits) == 6 and man.dag == {"persona/p": ["behavior/c1"]}
+    reopened.add_edge("persona/p", "behavior/c2"); reopened.flush()  # the writer drops the torn tail first
+    assert AtlasStore(path, journal=True).load().dag == {"persona/p": ["behavior/c1", "behavior/c2"]}
+    reopened.compact()
+    assert os.path.getsize(reopened.journal_path) == 0
+    assert len(AtlasStore(path).load().circuits) == 6
+    with AtlasStore(path, journal=True, group_commit=64, sync_interval=3600) as quiet:
+        quiet.load()
+        quiet.add_circuit(CircuitDiff("behavior/c6", {"rows": [6]}, "", {}))
+    assert len(AtlasStore(path, journal=True).load().circuits) == 7  # pending tail flushed on exit
+    fresh = AtlasStore(os.path.join(os.path.dirname(path), "fresh.json"), journal=True).new()
+    fresh.add_circuit(CircuitDiff("behavior/x", {"rows": [0]}, "", {})); fresh.flush()
+    assert "behavior/x" in AtlasStore(fresh.path, journal=True).load().circuits  # crash before first save()
+    fresh.manifest.projections["1->2"] = "sha256:" + "0" * 64 + ".npy"
+    fresh.manifest.families["behavior/x"] = {"other": 0.9}
+    fresh.manifest.lineage.append({"op": "test"})
+    fresh.save()  # fields outside circuits/dag are not journaled, so this writes a snapshot
+    back = AtlasStore(fresh.path, journal=True).load()
+    assert back.projections == fresh.manifest.projections and back.families and back.lineage == [{"op": "test"}]
+
+def test_sharded_blob_store_memmap_roundtrip():
+    import os, tempfile
+    from atlas.core.blobstore import ShardedBlobStore, parse_ref
+    store = ShardedBlobStore(tempfile.mkdtemp())
+    arr = np.random.randn(64, 16).astype(np.float32)
+    ref = store.put_array(arr)
+    h, suffix = parse_ref(ref)
+    assert suffix == ".npy" and parse_ref(save_npy_blob(arr, store.put))[0] == h
+    assert store.locate(ref) == os.path.join(store.root, h[:2], h[2:4], h + ".npy")
+    back = store.load_array(ref)
+    assert isinstance(back, np.memmap) and not back.flags.writeable
+    assert np.array_equal(back, arr)
+    assert not [f for f in os.listdir(store.root) if f.startswith(".tmp-")]
+    # Sharded blobs under BLOB_DIR load through the default content_address_load, as a zero-copy view
+    ref2 = ShardedBlobStore().put_array(arr.T)
+    got = load_npy_blob(ref2, content_address_load)
+    assert np.array_equal(got, arr.T) and not got.flags.writeable and not got.flags.owndata
+    assert np.array_equal(load_npy_blob(ref2, content_address_load, use_cache=False), arr.T)
+
+def test_blob_cache_stats_and_readonly():
+    from atlas.utils.utils import ArrayCache
+    cache = ArrayCache(max_bytes=3 * 4 * 16)
+    loads = []
+    def loader(ref):
+        loads.append(ref)
+        return np.zeros(16, dtype=np.float32)
+    a = cache.get("sha256:a", loader); cache.get("sha256:a", loader)
+    assert loads == ["sha256:a"] and cache.hits == 1 and not a.flags.writeable
+    for r in "bcd":
+        cache.get(f"sha256:{r}", loader)
+    assert cache.evictions == 1 and cache.nbytes <= cache.max_bytes
+
+def test_blob_gc_mark_and_sweep():
+    import os, tempfile
+    from atlas.core.atlas_store import AtlasStore
+    from atlas.core.blobstore import ShardedBlobStore, collect_garbage
+    d = tempfile.mkdtemp()
+    blobs = ShardedBlobStore(os.path.join(d, "blobs"))
+    live = blobs.put_array(np.eye(3)); dead = blobs.put_array(np.ones(3)); proj = blobs.put(b"projection")
+    store = AtlasStore(os.path.join(d, "atlas.json")).new()
+    store.add_circuit(CircuitDiff("behavior/c0", {"rows": [0]}, live, {}))
+    store.manifest.projections["1"] = proj
+    store.save()
+    rep = collect_garbage([store.path], root=blobs.root, dry_run=True, grace_seconds=0)
+    assert rep["swept"] == [dead] and blobs.exists(dead)
+    rep = collect_garbage([store.path], root=blobs.root, archive_dir=os.path.join(d, "attic"), grace_seconds=0)
+    assert not blobs.exists(dead) and blobs.exists(live) and blobs.exists(proj)
+    assert ShardedBlobStore(os.path.join(d, "attic")).exists(dead)
+    # A dedup hit on an old blob refreshes it, so a writer that has not saved its manifest yet keeps it
+    again = blobs.put_array(np.zeros(2))
+    os.utime(blobs.locate(again), (0, 0))
+    assert blobs.put_array(np.zeros(2)) == again
+    collect_garbage([store.path], root=blobs.root, grace_seconds=600)
+    assert blobs.exists(again)
+
+def test_packfile_repack_and_get_many():
+    import os, tempfile
+    from atlas.core.blobstore import ShardedBlobStore
+    from atlas.core.packfile import PackStore, repack
+    d = tempfile.mkdtemp()
+    loose = ShardedBlobStore(os.path.join(d, "loose"))
+    refs = [loose.put_array(np.eye(i + 1)) for i in range(20)]
+    packs = PackStore(os.path.join(d, "packs"))
+    rep = repack(loose.root, packs, delete_loose=True)
+    assert rep["packed"] == 20 and not list(loose.iter_refs())
+    reopened = PackStore(os.path.join(d, "packs"))
+    arrays = reopened.load_arrays(refs[::-1])
+    assert all(np.array_equal(arrays[r], np.eye(i + 1)) for i, r in enumerate(refs))
+    assert reopened.last_read_count == 1  # one pack, adjacent records -> one coalesced read
+    ref = reopened.put(b"tiny", ".dat")
+    assert reopened.get(ref) == b"tiny"
+    import pytest
+    with pytest.raises(ValueError, match="longer than 8 bytes"):
+        reopened.put(b"tiny", ".safetensors")  # would not fit the index's suffix field
+
+def test_transaction_undo_log_savepoints():
+    W = np.arange(100, dtype=np.float32).reshape(10, 10)
+    model = SimpleModel({"layer0": W, "layer1": np.zeros((4, 4), dtype=np.float32)})
+    tx = CircuitTransaction(model, mode="undo")
+    base = model.weights["layer0"]
+    tx.apply_row_delta("layer0", rows=[1, 3], delta=np.ones((2, 10), dtype=np.float32))
+    sp = tx.savepoint("after_first")
+    tx.apply_row_delta("layer1", rows=[0], delta=np.full((1, 4), 2.0, dtype=np.float32))
+    tx.savepoint("inner")
+    tx.apply_row_delta("layer0", rows=[3], delta=np.full((1, 10), 5.0, dtype=np.float32))
+    assert model.weights["layer0"] is base  # edited in place
+    assert sum(pre.size for _, _, pre in tx.undo_log) == 2*10 + 4 + 10  # only touched rows logged
+    tx.rollback_to(sp)
+    assert np.allclose(model.weights["layer1"], 0.0) and [n for n, _ in tx.savepoints] == ["after_first"]
+    assert np.allclose(model.weights["layer0"][3], W[3] + 1.0)
+    tx.rollback()
+    assert np.allclose(model.weights["layer0"], W)
+    import pytest
+    with pytest.raises(AssertionError, match="Unknown savepoint"):
+        tx.release("missing")
+    tx.commit()
+
+def test_spectral_norm_estimator_warm_start_and_weyl_skip():
+    from atlas.compile.stability import SpectralNormEstimator
+    from atlas.compile.materialize_mock import safe_apply_w2_delta
+    from atlas.models.mock import MockBehaviorModel
+    from atlas.semantics.encoder import ByteNGramEncoder
+    rng = np.random.RandomState(0)
+    A = rng.randn(40, 12)
+    exact = float(np.linalg.svd(A, compute_uv=False)[0])
+    est = SpectralNormEstimator(tol=1e-10)
+    assert abs(est.estimate(A, key="A") - exact) < 1e-6 * exact
+    assert est.estimate(A, key="A") == est.estimate(A.copy(), key="A") and est.stats["reused"] == 2
+    cold = est.stats["iterations"]
+    est.estimate(A + 1e-3 * rng.randn(40, 12), key="A")
+    assert est.stats["warm_starts"] == 1 and est.stats["iterations"] - cold < cold
+    assert SpectralNormEstimator(seed=3).estimate(A) == SpectralNormEstimator(seed=3).estimate(A)
+    m = MockBehaviorModel(ByteNGramEncoder(dim=64), d_hidden=16)
+    small = np.zeros_like(m.W2); small[0, 0] = 1e-4
+    rep = safe_apply_w2_delta(m, small, estimator=est)
+    assert rep["skipped"] and rep["gamma"] == 1.0
+    big = 10.0 * np.ones_like(m.W2)
+    rep = safe_apply_w2_delta(m, big, estimator=est)
+    assert not rep["skipped"] and rep["gamma"] < 1.0 and rep["trial"] > 1.2 * rep["base"]
+
+def test_streaming_alignment_and_fingerprint_match_batch():
+    from atlas.align.alignment import StreamingAligner, whiten_then_procrustes, dynamics_fingerprint, dynamics_fingerprint_stream
+    from atlas.utils.utils import randomized_svd
+    rng = np.random.RandomState(0)
+    Xs = rng.randn(400, 6) * np.array([1, 2, 3, 5, 8, 13.])
+    Xt = Xs @ rng.randn(6, 5) + 0.1 * rng.randn(400, 5)
+    al = StreamingAligner(6, 5)
+    for i in range(0, 400, 37):
+        al.update(Xs[i:i+37], Xt[i:i+37])
+    R, Ws, Wt = al.finalize()
+    R0, Ws0, Wt0 = whiten_then_procrustes(Xs, Xt)
+    assert np.allclose(Ws, Ws0) and np.allclose(Wt, Wt0)
+    assert np.allclose(np.abs(R), np.abs(R0), atol=1e-4)  # bases agree up to per-vector sign
+    U, S, Vt = randomized_svd(Xs, 3)
+    assert np.allclose(S, np.linalg.svd(Xs, compute_uv=False)[:3])
+    acts = rng.gamma(2.0, size=(20000, 4))
+    fp, fp0 = dynamics_fingerprint_stream(acts[i:i+1000] for i in range(0, 20000, 1000)), dynamics_fingerprint(acts)
+    assert np.allclose(fp["spectrum"], fp0["spectrum"])
+    assert np.allclose(fp["sat"], fp0["sat"], rtol=0.05)
+
+def test_transfer_atlas_batches_and_caches_projections():
+    from atlas.align.transfer import transfer_atlas
+    from atlas.core.atlas_store import AtlasStore
+    from atlas.discover.to_circuit import mask_to_circuit
+    rng = np.random.RandomState(0)
+    Xs = np.maximum(rng.randn(600, 12) @ rng.randn(12, 12), 0)
+    Xt = Xs @ rng.randn(12, 8) + 0.05 * rng.randn(600, 8)
+    src = AtlasStore("/mnt/data/universal_atlas/atlas/transfer_src.json").new()
+    for i, rows in enumerate([[0, 3, 5], [1, 2], [7, 8, 9, 10]]):
+        src.add_circuit(mask_to_circuit(f"behavior/b{i}@v1", layer=1, rows_mask=np.isin(np.arange(12), rows)))
+    tgt = AtlasStore("/mnt/data/universal_atlas/atlas/transfer_tgt.json").new(family="other")
+    calls = []
+    def acts(s, t):
+        calls.append((s, t))
+        return ((Xs[i:i+100], Xt[i:i+100]) for i in range(0, 600, 100))
+    rep = transfer_atlas(src.manifest, "other", {1: 2}, acts, target_store=tgt)
+    assert calls == [(1, 2)] and rep["pairs"]["other:1->2@k32"] == dict(rep["pairs"]["other:1->2@k32"], cached=False, circuits=3)
+    fid = {cid: f["other"] for cid, f in src.manifest.families.items()}
+    assert len(fid) == 3 and all(0.5 < f <= 1.0 for f in fid.values())
+    assert tgt.manifest.circuits["behavior/b2@v1"].support["layer"] == 2
+    src.save()
+    again = AtlasStore(src.path).load()
+    rep2 = transfer_atlas(again, "other", {1: 2}, acts)
+    assert calls == [(1, 2)] and rep2["pairs"]["other:1->2@k32"]["cached"]
+    assert rep2["mapped"] == rep["mapped"]
+    rep3 = transfer_atlas(again, "other", {1: 2}, acts, k=4)  # another rank is a different projection
+    assert calls == [(1, 2)] * 2 and not rep3["pairs"]["other:1->2@k4"]["cached"]
+
+def test_bench_suite_reports_and_compares():
+    import json
+    from atlas.bench.run import BENCHMARKS, compare, run_suite
+    from atlas.bench.workloads import SCALES
+    rep = run_suite(SCALES["tiny"], repeat=1, warmup=0)
+    assert set(rep["results"]) == set(BENCHMARKS)
+    assert all(r["median"] > 0 for r in rep["results"].values())
+    base = json.loads(json.dumps(rep))
+    assert compare(rep, base)["regressions"] == []
+    slow = json.loads(json.dumps(rep))
+    slow["results"]["model.forward"]["median"] = base["results"]["model.forward"]["median"] * 2 + 0.01
+    del slow["results"]["plan.solve_knobs"]
+    cmp = compare(slow, base, tolerance=0.2)
+    assert cmp["regressions"] == ["model.forward"] and cmp["missing"] == ["plan.solve_knobs"]
+
 if __name__ == "__main__":
     # Run tests and print a simple report
     tests = [obj for name, obj in globals().items() if name.startswith("test_")]
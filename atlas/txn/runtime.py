@@ -1,9 +1,12 @@
 
-import copy, numpy as np
+import numpy as np
 from typing import Dict, Tuple
 from .transaction import SimpleModel, CircuitTransaction
 from ..models.mock import MockBehaviorModel
-from ..tests.invariants import regression_board, evaluate_invariants
+from ..models.overlay import OverlayModel
+from ..tests.invariants import DEFAULT_POLICY, InvariantEvaluator
+
+_EVALUATOR = InvariantEvaluator()  # baselines shared across plans (and threads) on the same base model
 
 def apply_plan_with_invariants(model: MockBehaviorModel, plan, *, crit_thresholds=None):
     """Apply a plan by translating each circuit knob into a W2 delta on the mock model; run invariants; rollback on fail.
@@ -11,15 +14,12 @@ def apply_plan_with_invariants(model: MockBehaviorModel, plan, *, crit_threshold
     Also populates plan.stability_margins.
     """
     from ..compile.materialize_mock import materialize_mask_as_w2_delta, safe_apply_w2_delta
-    tx_model = copy.deepcopy(model)
-    orig = copy.deepcopy(model)
-    board = regression_board()
-    policy = {
-        "instruction_following": (board["instruction_following"], 0.9, True),
-        "safety": (board["safety"], 0.9, True),
-        "neutrality": (board["neutrality"], 0.8, False)
-    }
+    from ..compile.stability import SpectralNormEstimator
+    # Edits go to a W2 overlay; the base model doubles as the unmodified original until commit
+    tx_model = OverlayModel(model)
+    orig = model
     plan.stability_margins = {}
+    estimator = SpectralNormEstimator()  # warm-started across the plan's circuits
     for cid in plan.circuits:
         knob = plan.knobs.get(cid, 0.0)
         circ = plan.atlas.circuits[cid] if hasattr(plan, "atlas") else None
@@ -31,10 +31,10 @@ def apply_plan_with_invariants(model: MockBehaviorModel, plan, *, crit_threshold
         mask = np.zeros(tx_model.W2.shape[0], dtype=bool)
         if rows.size>0: mask[rows] = True
         dW2 = materialize_mask_as_w2_delta(tx_model, mask, head_idx=head_idx, magnitude=float(knob))
-        rep = safe_apply_w2_delta(tx_model, dW2)
+        rep = safe_apply_w2_delta(tx_model, dW2, estimator=estimator)
         plan.stability_margins[cid] = rep
-    ok, results = evaluate_invariants(orig, tx_model, policy)
+    ok, results = _EVALUATOR.evaluate(orig, tx_model, DEFAULT_POLICY)
     if not ok:
         return False, results, model  # unchanged
-    model.W1 = tx_model.W1; model.W2 = tx_model.W2; model.b1 = tx_model.b1; model.b2 = tx_model.b2
+    tx_model.commit()
     return True, results, model
@@ -11,23 +11,63 @@ class SimpleModel:
         self.weights = {k: v.copy() for k,v in st.items()}
 
 class CircuitTransaction:
-    def __init__(self, model: SimpleModel):
+    """Row edits on a SimpleModel that can be rolled back step by step or to a named savepoint.
+    mode="checkpoint" snapshots the full state before every edit; mode="undo" edits in place and
+    logs only the pre-images of the touched rows, so memory and rollback cost are O(touched rows).
+    """
+    def __init__(self, model: SimpleModel, mode: str = "checkpoint"):
+        assert mode in ("checkpoint", "undo"), f"Unknown transaction mode: {mode}"
         self.model = model
+        self.mode = mode
         self.checkpoints: List[Dict[str, np.ndarray]] = []
+        self.undo_log: List[Tuple[str, np.ndarray, np.ndarray]] = []  # (param, rows, pre-image rows)
+        self.savepoints: List[Tuple[str, int]] = []                     # (name, number of applied steps)
         self.history: List[Dict[str, Any]] = []
     def apply_row_delta(self, param: str, rows, delta):
-        self.checkpoints.append(self.model.state_dict())
-        W = self.model.weights[param]
-        W2 = W.copy()
-        W2[rows] += delta
-        self.model.weights[param] = W2
+        if self.mode == "undo":
+            W = self.model.weights[param]
+            idx = np.asarray(rows)
+            self.undo_log.append((param, idx.copy(), W[idx].copy()))
+            W[idx] += delta
+        else:
+            self.checkpoints.append(self.model.state_dict())
+            W = self.model.weights[param]
+            W2 = W.copy()
+            W2[rows] += delta
+            self.model.weights[param] = W2
         self.history.append({"param":param,"rows":list(rows),"delta_shape":list(delta.shape),"ts":time.time()})
     def rollback(self, steps: int = 1):
-        if steps>len(self.checkpoints): steps=len(self.checkpoints)
+        undoable = len(self.undo_log) if self.mode == "undo" else len(self.checkpoints)
+        if steps>undoable: steps=undoable
         if steps==0: return
-        st = self.checkpoints[-steps]
-        self.model.load_state_dict(st)
-        self.checkpoints = self.checkpoints[:-steps]
+        if self.mode == "undo":
+            for _ in range(steps):
+                param, idx, pre = self.undo_log.pop()
+                self.model.weights[param][idx] = pre
+        else:
+            st = self.checkpoints[-steps]
+            self.model.load_state_dict(st)
+            self.checkpoints = self.checkpoints[:-steps]
         self.history = self.history[:-steps]
+        n = len(self.history)
+        self.savepoints = [(name, pos) for name, pos in self.savepoints if pos <= n]
+    def savepoint(self, name: str = None) -> str:
+        """Mark the current state; savepoints nest and later ones are dropped when rolling back past them."""
+        name = name or f"sp{len(self.savepoints)}"
+        self.savepoints.append((name, len(self.history)))
+        return name
+    def rollback_to(self, name: str):
+        """Undo every edit made since savepoint `name` (the savepoint itself stays valid)."""
+        pos = [p for n, p in self.savepoints if n == name]
+        assert pos, f"Unknown savepoint: {name}"
+        self.rollback(len(self.history) - pos[-1])
+    def release(self, name: str):
+        """Forget savepoint `name` and every savepoint taken after it, keeping their edits."""
+        pos = [i for i, (n, _) in enumerate(self.savepoints) if n == name]
+        assert pos, f"Unknown savepoint: {name}"
+        i = pos[-1]
+        self.savepoints = self.savepoints[:i]
     def commit(self):
         self.checkpoints = []
+        self.undo_log = []
+        self.savepoints = []
@@ -1,7 +1,8 @@
 
 import numpy as np
-import os, json, hashlib, base64, io
-from typing import Tuple
+import os, json, hashlib, base64, io, threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Sequence, Tuple
 
 def set_seed(seed: int = 1234):
     np.random.seed(seed)
@@ -13,10 +14,127 @@ def save_npy_blob(arr: np.ndarray, store_fn):
     ref = store_fn(bio.getvalue())
     return ref
 
-def load_npy_blob(ref: str, load_fn) -> np.ndarray:
-    import numpy as np, io
-    b = load_fn(ref)
-    return np.load(io.BytesIO(b), allow_pickle=False)
+class ArrayCache:
+    """Thread-safe LRU of decoded arrays keyed by blob ref, bounded by total array bytes.
+    Refs are content addresses, so entries never go stale; cached arrays are read-only.
+    """
+    def __init__(self, max_bytes: int = 256 << 20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._arrays: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, ref: str, loader: Callable[[str], np.ndarray]) -> np.ndarray:
+        with self._lock:
+            arr = self._arrays.get(ref)
+            if arr is not None:
+                self._arrays.move_to_end(ref)
+                self.hits += 1
+                return arr
+            self.misses += 1
+        arr = loader(ref)
+        arr.setflags(write=False)
+        with self._lock:
+            if ref not in self._arrays and arr.nbytes <= self.max_bytes:
+                self._arrays[ref] = arr
+                self.nbytes += arr.nbytes
+                while self.nbytes > self.max_bytes:
+                    _, old = self._arrays.popitem(last=False)
+                    self.nbytes -= old.nbytes
+                    self.evictions += 1
+        return arr
+
+    def clear(self) -> None:
+        with self._lock:
+            self._arrays.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._arrays), "bytes": self.nbytes, "max_bytes": self.max_bytes}
+
+# Process-wide cache shared by every load_npy_blob caller
+BLOB_CACHE = ArrayCache(int(os.environ.get("ATLAS_BLOB_CACHE_BYTES", 256 << 20)))
+
+def _npy_view(b: bytes) -> np.ndarray:
+    """Read-only array over the data of a .npy payload, without copying it out of b."""
+    bio = io.BytesIO(b)
+    version = np.lib.format.read_magic(bio)
+    read = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+    shape, fortran, dtype = read(bio)
+    if dtype.hasobject:
+        raise ValueError("Object arrays are not supported in blobs")
+    arr = np.frombuffer(b, dtype=dtype, count=int(np.prod(shape)), offset=bio.tell())
+    return arr.reshape(shape, order="F" if fortran else "C")
+
+def load_npy_blob(ref: str, load_fn, use_cache: bool = True) -> np.ndarray:
+    """Decode a .npy blob. With use_cache the array comes from BLOB_CACHE and is a read-only view of the
+    loaded bytes; without it the array is a writable copy."""
+    if use_cache:
+        return BLOB_CACHE.get(ref, lambda r: _npy_view(load_fn(r)))
+    return np.load(io.BytesIO(load_fn(ref)), allow_pickle=False)
+
+class RunningMoments:
+    """Per-column count, mean and sum of squared deviations, updated a chunk at a time.
+    Chunks are folded in with the Chan et al. pairwise (Welford) merge, so memory is O(columns).
+    """
+    def __init__(self, dim: int):
+        self.n = 0
+        self.mean = np.zeros(dim, dtype=np.float64)
+        self.m2 = np.zeros(dim, dtype=np.float64)
+
+    def update(self, X: np.ndarray) -> "RunningMoments":
+        X = np.asarray(X, dtype=np.float64)
+        if X.shape[0] == 0:
+            return self
+        mean = X.mean(0)
+        return self._merge(X.shape[0], mean, ((X - mean) ** 2).sum(0))
+
+    def merge(self, other: "RunningMoments") -> "RunningMoments":
+        return self._merge(other.n, other.mean, other.m2)
+
+    def _merge(self, n: int, mean: np.ndarray, m2: np.ndarray) -> "RunningMoments":
+        if n == 0:
+            return self
+        tot = self.n + n
+        d = mean - self.mean
+        self.mean = self.mean + d * (n / tot)
+        self.m2 = self.m2 + m2 + d * d * (self.n * n / tot)
+        self.n = tot
+        return self
+
+    def var(self, ddof: int = 0) -> np.ndarray:
+        return self.m2 / max(self.n - ddof, 1)
+
+class RunningCovariance(RunningMoments):
+    """RunningMoments that also tracks the full co-moment matrix sum (x - mean)(x - mean)^T."""
+    def __init__(self, dim: int):
+        super().__init__(dim)
+        self.C = np.zeros((dim, dim), dtype=np.float64)
+
+    def update(self, X: np.ndarray) -> "RunningCovariance":
+        X = np.asarray(X, dtype=np.float64)
+        if X.shape[0] == 0:
+            return self
+        mean = X.mean(0)
+        Xc = X - mean
+        return self._merge_cov(X.shape[0], mean, Xc.T @ Xc)
+
+    def merge(self, other: "RunningCovariance") -> "RunningCovariance":
+        return self._merge_cov(other.n, other.mean, other.C)
+
+    def _merge_cov(self, n: int, mean: np.ndarray, C: np.ndarray) -> "RunningCovariance":
+        if n == 0:
+            return self
+        d = mean - self.mean
+        self.C = self.C + C + np.outer(d, d) * (self.n * n / (self.n + n))
+        return self._merge(n, mean, np.diag(C).copy())
+
+    def cov(self, ddof: int = 0) -> np.ndarray:
+        return self.C / max(self.n - ddof, 1)
 
 def orthogonal_procrustes(A: np.ndarray, B: np.ndarray) -> np.ndarray:
     # Solve R = argmin ||RA - B||_F, with R orthogonal. Return R.
@@ -24,12 +142,84 @@ def orthogonal_procrustes(A: np.ndarray, B: np.ndarray) -> np.ndarray:
     R = U @ Vt
     return R
 
+def whitening_matrix(C: np.ndarray, eps: float = 1e-6) -> np.ndarray:
+    """Symmetric inverse square root (C + eps I)^(-1/2) of a covariance matrix."""
+    vals, vecs = np.linalg.eigh(C + eps*np.eye(C.shape[0]))
+    return vecs @ np.diag(1.0/np.sqrt(vals)) @ vecs.T
+
 def whiten(X: np.ndarray, eps: float = 1e-6) -> Tuple[np.ndarray, np.ndarray]:
     # Zero-mean and whiten features in columns. Return (Xw, W) with W s.t. X @ W = Xw
     mu = X.mean(axis=0, keepdims=True)
     Xc = X - mu
     C = (Xc.T @ Xc) / max(1, Xc.shape[0]-1)
-    vals, vecs = np.linalg.eigh(C + eps*np.eye(C.shape[0]))
-    W = vecs @ np.diag(1.0/np.sqrt(vals)) @ vecs.T
+    W = whitening_matrix(C, eps)
     Xw = Xc @ W
     return Xw, W
+
+def randomized_svd(A: np.ndarray, k: int, n_oversample: int = 10, n_iter: int = 4, seed: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Rank-k truncated SVD (U, S, Vt) by randomized range finding with power iterations (Halko et al.)."""
+    rng = np.random.RandomState(seed)
+    k = min(k, *A.shape)
+    Q = A @ rng.normal(size=(A.shape[1], min(k + n_oversample, A.shape[1])))
+    for _ in range(n_iter):
+        Q, _ = np.linalg.qr(Q)
+        Q, _ = np.linalg.qr(A.T @ Q)
+        Q = A @ Q
+    Q, _ = np.linalg.qr(Q)
+    Ub, S, Vt = np.linalg.svd(Q.T @ A, full_matrices=False)
+    return (Q @ Ub)[:, :k], S[:k], Vt[:k]
+
+class QuantileSketch:
+    """Mergeable KLL-style quantile sketch over the columns of a stream of n x d chunks.
+    Level l holds rows of weight 2^l; a level that exceeds k rows is sorted per column and every
+    other row (random offset) is promoted, so memory is O(k log(n/k) d) and rank error O(n/k).
+    """
+    def __init__(self, dim: int, k: int = 256, seed: int = 0):
+        self.dim = dim
+        self.k = k
+        self.n = 0
+        self.rng = np.random.RandomState(seed)
+        self.levels: List[np.ndarray] = [np.zeros((0, dim))]
+
+    def update(self, X: np.ndarray) -> "QuantileSketch":
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.dim)
+        self.n += X.shape[0]
+        self.levels[0] = np.concatenate([self.levels[0], X])
+        self._compress()
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.zeros((0, self.dim)))
+        for l, rows in enumerate(other.levels):
+            self.levels[l] = np.concatenate([self.levels[l], rows])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _compress(self) -> None:
+        l = 0
+        while l < len(self.levels):
+            rows = self.levels[l]
+            if rows.shape[0] > self.k:
+                rows = np.sort(rows, axis=0)
+                even = rows.shape[0] - rows.shape[0] % 2
+                if l + 1 == len(self.levels):
+                    self.levels.append(np.zeros((0, self.dim)))
+                self.levels[l+1] = np.concatenate([self.levels[l+1], rows[self.rng.randint(2):even:2]])
+                self.levels[l] = rows[even:]
+            l += 1
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        """len(qs) x d estimates of the per-column quantiles qs (fractions in [0, 1])."""
+        items = np.concatenate(self.levels)
+        w = np.concatenate([np.full(r.shape[0], 2.0**l) for l, r in enumerate(self.levels)])
+        order = np.argsort(items, axis=0)
+        vals = np.take_along_axis(items, order, axis=0)
+        cum = np.cumsum(w[order], axis=0)  # per-column weighted ranks
+        total = cum[-1]
+        out = np.empty((len(qs), self.dim))
+        for i, q in enumerate(qs):
+            idx = np.minimum((cum < q * total).sum(0), items.shape[0] - 1)
+            out[i] = vals[idx, np.arange(self.dim)]
+        return out